@@ -6,25 +6,34 @@ This module provides a simple agent that can:
 - Loop between LLM and tools until the task is done
 
 Usage from Flask:
-    from agents.agent_interface import create_agent, run_agent
+    from agents.agent_interface import run_agent
     
-    # On app startup:
-    create_agent()
-    
-    # In a route:
+    # In a route (the agent is created on the first call):
     result = run_agent("Create a task called 'Buy milk'")
 """
-import inspect
+import contextvars
 import os
-from typing import Any, Dict, List, Optional, Annotated
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Annotated, Tuple
+from langgraph.config import get_stream_writer
 from langgraph.graph import StateGraph, END
 from langchain_core.messages import AnyMessage, SystemMessage, HumanMessage, ToolMessage, AIMessage
-from langchain_openai import ChatOpenAI
 from langchain_core.tools import tool
 import operator
 from dotenv import load_dotenv
 
-from app.utils import chroma_tools
+from app.db.chroma_manager import PERSIST_DIR
+from app.utils import chroma_tools, tracing
+from agents.llm_backends import create_llm
+from agents.llm_cache import LLM_CACHE_ENABLED, LLMResponseCache
+from agents.scheduler import AsyncRuntime, LLMScheduler, RunRegistry
+from agents.sessions import SessionStore, budget_messages
+from agents.tool_formatters import format_tool_result
+from agents.tool_schemas import load_tool_registry
+from app.utils.metrics import (AGENT_LLM_CACHE_HITS, AGENT_LLM_SECONDS, AGENT_LOOP_ITERATIONS,
+                               AGENT_TOKENS, AGENT_TOOL_SECONDS)
 
 # Load environment variables
 load_dotenv()
@@ -34,90 +43,58 @@ class AgentState(dict):
     messages: Annotated[List[AnyMessage], operator.add]
 
 
-# Global agent instance
+# Tools that only read data; consecutive calls to these run concurrently
+READ_ONLY_TOOLS = {
+    "search_notes",
+    "search_tasks",
+    "get_note_chroma",
+    "get_task_chroma",
+    "rag_context_for_query",
+}
+TOOL_WORKERS = int(os.getenv("AGENT_TOOL_WORKERS", "4"))
+
+# Global agent instance, created on first use
 _agent = None
+_agent_lock = threading.Lock()
+# Event loop shared by async agent runs
+_runtime = AsyncRuntime()
+# Background runs started by start_agent_run, polled with get_agent_run
+_runs = RunRegistry()
 
 
 class SimpleAgent:
     """A simple agent that loops between LLM and tools."""
     
-    def __init__(self, system_prompt: str = ""):
+    def __init__(self, system_prompt: str = "", backend: Optional[str] = None):
         self.system_prompt = system_prompt
-        self.tools = self._load_tools()
-        
-        # Setup LLM (Groq API with tool-calling support)
-        self.llm = ChatOpenAI(
-            model="openai/gpt-oss-120b",
-            api_key=os.getenv("GROQ_API_KEY"),
-            base_url="https://api.groq.com/openai/v1",
-            temperature=0.0
-        )
+        self.tools, tool_schemas = load_tool_registry(chroma_tools)
+        self.tool_executor = ThreadPoolExecutor(max_workers=TOOL_WORKERS, thread_name_prefix="agent-tool")
         
-        # Bind tools to LLM
-        from langchain_core.utils.function_calling import convert_to_openai_tool
-        tool_schemas = []
-        for name, func in self.tools.items():
-            tool_schemas.append({
-                "type": "function",
-                "function": {
-                    "name": name,
-                    "description": func.__doc__ or f"Call the {name} function",
-                    "parameters": {
-                        "type": "object",
-                        "properties": self._get_function_schema(func),
-                        "required": []
-                    }
-                }
-            })
+        # Setup LLM (AGENT_LLM_BACKEND: remote Groq API by default, see llm_backends)
+        self.llm = create_llm(backend)
+        self.model_name = getattr(self.llm, "model_name", None) or getattr(self.llm, "model", None) or self.llm._llm_type
         
+        # Bind tools to LLM (schemas are generated once and cached, see tool_schemas)
+        self.tool_schemas = tool_schemas
         self.llm = self.llm.bind(tools=tool_schemas)
         
-        # Build the graph
-        self.graph = self._build_graph()
-    
-    def _get_function_schema(self, func) -> dict:
-        """Extract parameter schema from function signature."""
-        import inspect
-        sig = inspect.signature(func)
-        properties = {}
-        for param_name, param in sig.parameters.items():
-            param_type = "string"
-            param_description = ""
-            
-            if param.annotation != inspect.Parameter.empty:
-                if param.annotation == int:
-                    param_type = "integer"
-                elif param.annotation == bool:
-                    param_type = "boolean"
-                elif param.annotation == str:
-                    param_type = "string"
-            
-            # Add description for common parameters
-            if param_name == "query":
-                param_description = "A single search query string"
-            elif param_name == "top_k":
-                param_description = "Number of results to return"
-            
-            properties[param_name] = {
-                "type": param_type,
-                "description": param_description
-            }
-        return properties
-    
-    def _load_tools(self) -> Dict[str, Any]:
-        """Load all functions from chroma_tools as tools."""
-        tools = {}
-        for name, func in inspect.getmembers(chroma_tools, inspect.isfunction):
-            if not name.startswith("_"):
-                tools[name] = func
-        return tools
-    
-    def _build_graph(self):
+        # Optional response cache (AGENT_LLM_CACHE=1)
+        self.response_cache = LLMResponseCache(read_only_tools=READ_ONLY_TOOLS) if LLM_CACHE_ENABLED else None
+        
+        # Conversation histories for requests that pass a session_id (shared through SQLite)
+        self.sessions = SessionStore(PERSIST_DIR)
+        
+        # Build the graphs (sync and async LLM node; tools run in threads either way)
+        self.scheduler = LLMScheduler()
+        self.graph = self._build_graph(self.call_llm)
+        self.agraph = self._build_graph(self.acall_llm)
+    
+    def _build_graph(self, llm_node):
         """Build the StateGraph with LLM and action nodes."""
         graph = StateGraph(AgentState)
         
         # Add nodes
-        graph.add_node("llm", self.call_llm)
+        graph.add_node("llm", llm_node)
         graph.add_node("action", self.call_tools)
         
         # Add edges
@@ -133,16 +110,67 @@ class SimpleAgent:
         
         return graph.compile()
     
-    def call_llm(self, state: AgentState):
-        """Call the LLM with current messages."""
-        messages = state["messages"]
+    def _prompt_messages(self, state: AgentState) -> List[AnyMessage]:
+        """Messages to send to the LLM for the current state, bounded by the token budget."""
+        messages = budget_messages(state["messages"])
         
         # Add system prompt if we have one
         if self.system_prompt:
             messages = [SystemMessage(content=self.system_prompt)] + messages
-        
-        # Call LLM
-        response = self.llm.invoke(messages)
+        return messages
+    
+    def _cached_response(self, messages: List[AnyMessage]) -> Tuple[Optional[str], Optional[AIMessage]]:
+        """Look up the response cache. Returns (cache key, cached response or None)."""
+        if self.response_cache is None:
+            return None, None
+        key = self.response_cache.key(self.model_name, self.tool_schemas, messages)
+        response = self.response_cache.get(key)
+        if response is not None:
+            AGENT_LLM_CACHE_HITS.inc()
+        return key, response
+    
+    def _record_usage(self, response: AIMessage) -> None:
+        """Count the prompt/completion tokens reported with an LLM response."""
+        usage = getattr(response, "usage_metadata", None) or {}
+        prompt, completion = usage.get("input_tokens"), usage.get("output_tokens")
+        if prompt is None:
+            token_usage = (getattr(response, "response_metadata", None) or {}).get("token_usage") or {}
+            prompt, completion = token_usage.get("prompt_tokens"), token_usage.get("completion_tokens")
+        if prompt:
+            AGENT_TOKENS.inc(prompt, model=self.model_name, kind="prompt")
+        if completion:
+            AGENT_TOKENS.inc(completion, model=self.model_name, kind="completion")
+    
+    def call_llm(self, state: AgentState):
+        """Call the LLM with current messages."""
+        with tracing.span("agent.call_llm", model=self.model_name) as span:
+            messages = self._prompt_messages(state)
+            key, response = self._cached_response(messages)
+            if span is not None:
+                span.set_attribute("cached", response is not None)
+            if response is None:
+                with AGENT_LLM_SECONDS.time(model=self.model_name):
+                    response = self.llm.invoke(messages)
+                self._record_usage(response)
+                if key:
+                    self.response_cache.put(key, messages, response)
+        return {"messages": [response]}
+    
+    async def acall_llm(self, state: AgentState):
+        """Call the LLM asynchronously, waiting for a scheduler slot first."""
+        with tracing.span("agent.call_llm", model=self.model_name) as span:
+            messages = self._prompt_messages(state)
+            key, response = self._cached_response(messages)
+            if span is not None:
+                span.set_attribute("cached", response is not None)
+            if response is None:
+                async with self.scheduler.slot():
+                    # Timed inside the slot so scheduler queueing is not counted as LLM latency
+                    with AGENT_LLM_SECONDS.time(model=self.model_name):
+                        response = await self.llm.ainvoke(messages)
+                self._record_usage(response)
+                if key:
+                    self.response_cache.put(key, messages, response)
         return {"messages": [response]}
     
     def should_continue(self, state: AgentState) -> bool:
@@ -150,48 +178,153 @@ class SimpleAgent:
         last_message = state["messages"][-1]
         return hasattr(last_message, "tool_calls") and len(last_message.tool_calls) > 0
     
-    def call_tools(self, state: AgentState):
-        """Execute the tools requested by LLM."""
-        last_message = state["messages"][-1]
-        tool_calls = last_message.tool_calls
+    def _stream_writer(self) -> Callable[[Dict[str, Any]], None]:
+        """Get LangGraph's custom stream writer, or a no-op outside of a graph run."""
+        try:
+            return get_stream_writer()
+        except RuntimeError:
+            return lambda _: None
+    
+    def _run_tool(self, tool_call: Dict[str, Any], emit: Optional[Callable[[Dict[str, Any]], None]] = None) -> ToolMessage:
+        """Execute one tool call and wrap the result in a ToolMessage.
+        
+        `emit` receives tool_start/tool_end events for streaming runs.
+        """
+        tool_name = tool_call["name"]
+        tool_args = tool_call.get("args", {})
+        if emit:
+            emit({"event": "tool_start", "id": tool_call["id"], "name": tool_name, "args": tool_args})
         
-        results = []
-        for tool_call in tool_calls:
-            tool_name = tool_call["name"]
-            tool_args = tool_call.get("args", {})
-            
-            # Check if tool exists
-            if tool_name not in self.tools:
-                result = f"Error: Tool '{tool_name}' not found"
-            else:
-                # Call the tool
+        # Check if tool exists
+        if tool_name not in self.tools:
+            result = f"Error: Tool '{tool_name}' not found"
+        else:
+            # Call the tool
+            start = time.perf_counter()
+            outcome = "ok"
+            with tracing.span(f"tool.{tool_name}") as span:
                 try:
                     result = self.tools[tool_name](**tool_args)
                 except Exception as e:
                     result = f"Error calling {tool_name}: {str(e)}"
-            
-            # Create tool message
-            results.append(
-                ToolMessage(
-                    content=str(result),
-                    tool_call_id=tool_call["id"],
-                    name=tool_name
-                )
-            )
+                    outcome = "error"
+                if span is not None:
+                    span.set_attribute("outcome", outcome)
+            AGENT_TOOL_SECONDS.observe(time.perf_counter() - start, tool=tool_name, outcome=outcome)
+            if self.response_cache is not None:
+                self.response_cache.invalidate_tool(tool_name)
+        
+        message = ToolMessage(
+            content=format_tool_result(tool_name, result),
+            tool_call_id=tool_call["id"],
+            name=tool_name
+        )
+        if emit:
+            emit({"event": "tool_end", "id": tool_call["id"], "name": tool_name, "content": message.content})
+        return message
+    
+    def call_tools(self, state: AgentState):
+        """Execute the tools requested by LLM.
+        
+        Runs of consecutive read-only tools execute concurrently; any other tool
+        waits for the calls before it and runs alone, so writes keep their order.
+        Messages are returned in the original call order.
+        """
+        last_message = state["messages"][-1]
+        tool_calls = last_message.tool_calls
+        emit = self._stream_writer()
+        
+        results = [None] * len(tool_calls)
+        with tracing.span("agent.call_tools", tools=len(tool_calls)):
+            running = []
+            for i, tool_call in enumerate(tool_calls):
+                if tool_call["name"] in READ_ONLY_TOOLS:
+                    # Run in a copy of this context so LangGraph's stream writer (and the trace) work in the worker
+                    context = contextvars.copy_context()
+                    running.append((i, self.tool_executor.submit(context.run, self._run_tool, tool_call, emit)))
+                    continue
+                for j, future in running:
+                    results[j] = future.result()
+                running = []
+                results[i] = self._run_tool(tool_call, emit)
+            for j, future in running:
+                results[j] = future.result()
         
         return {"messages": results}
     
-    def run(self, user_message: str) -> List[Dict[str, Any]]:
-        """Run the agent with a user message and return all messages as JSON array."""
-        # Start with user message
-        initial_state = {"messages": [HumanMessage(content=user_message)]}
+    def _initial_state(self, user_message: str, session_id: Optional[str]) -> Dict[str, Any]:
+        """Start a run from the session history (if any) plus the new user message."""
+        history = self.sessions.load(session_id) if session_id else []
+        return {"messages": history + [HumanMessage(content=user_message)]}
+    
+    def _finish(self, user_message: str, session_id: Optional[str], messages: List[AnyMessage]) -> None:
+        """Record the turn's loop iterations and store its final answer in the session."""
+        AGENT_LOOP_ITERATIONS.observe(sum(1 for m in messages if isinstance(m, AIMessage)))
+        if not session_id:
+            return
+        answers = [m for m in messages if isinstance(m, AIMessage) and not m.tool_calls]
+        self.sessions.append(session_id, user_message, str(answers[-1].content) if answers else "")
+    
+    def run(self, user_message: str, session_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Run the agent with a user message and return this turn's messages as JSON array.
+        
+        With a session_id the earlier turns of that session are used as context.
+        """
+        initial_state = self._initial_state(user_message, session_id)
+        start = len(initial_state["messages"]) - 1
         
         # Run the graph
         final_state = self.graph.invoke(initial_state)
         
-        # Convert all messages to JSON-serializable format
+        new_messages = final_state["messages"][start:]
+        self._finish(user_message, session_id, new_messages)
+        return self._messages_to_json(new_messages)
+    
+    async def arun(self, user_message: str, session_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Async version of run(). LLM calls go through the scheduler.
+        
+        Await it from a single event loop (see AsyncRuntime) so the scheduler
+        limit applies to every run.
+        """
+        initial_state = self._initial_state(user_message, session_id)
+        start = len(initial_state["messages"]) - 1
+        final_state = await self.agraph.ainvoke(initial_state)
+        
+        new_messages = final_state["messages"][start:]
+        self._finish(user_message, session_id, new_messages)
+        return self._messages_to_json(new_messages)
+    
+    def stream(self, user_message: str, session_id: Optional[str] = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Run the agent and yield (event, data) pairs as they happen.
+        
+        Events:
+            token: {"content"} - a chunk of LLM text
+            tool_start: {"id", "name", "args"} - a tool call started
+            tool_end: {"id", "name", "content"} - a tool call finished, with its result
+            done: {"messages"} - this turn's messages, same as run()
+        """
+        initial_state = self._initial_state(user_message, session_id)
+        new_messages = initial_state["messages"][-1:]
+        
+        for mode, chunk in self.graph.stream(initial_state, stream_mode=["messages", "custom", "updates"]):
+            if mode == "messages":
+                message, metadata = chunk
+                # Streaming models send AIMessageChunks; others send one full AIMessage
+                if metadata.get("langgraph_node") == "llm" and isinstance(message, AIMessage) and message.content:
+                    yield "token", {"content": message.content}
+            elif mode == "custom":
+                yield chunk["event"], {k: v for k, v in chunk.items() if k != "event"}
+            elif mode == "updates":
+                for update in chunk.values():
+                    new_messages.extend((update or {}).get("messages", []))
+        
+        self._finish(user_message, session_id, new_messages)
+        yield "done", {"messages": self._messages_to_json(new_messages)}
+    
+    def _messages_to_json(self, messages: List[AnyMessage]) -> List[Dict[str, Any]]:
+        """Convert all messages to JSON-serializable format."""
         messages_json = []
-        for msg in final_state["messages"]:
+        for msg in messages:
             if isinstance(msg, HumanMessage):
                 messages_json.append({
                     "type": "human",
@@ -217,22 +350,57 @@ class SimpleAgent:
         
         return messages_json
 
-def create_agent(system_prompt: str = "You are a helpful assistant that can manage tasks and notes. Use the available tools to help users."):
-    """Create the agent. Call this once when Flask starts."""
+def create_agent(system_prompt: str = "You are a helpful assistant that can manage tasks and notes. Use the available tools to help users.",
+                 backend: Optional[str] = None):
+    """Create (or replace) the global agent."""
     global _agent
-    _agent = SimpleAgent(system_prompt=system_prompt)
+    _agent = SimpleAgent(system_prompt=system_prompt, backend=backend)
     return _agent
 
 
-def run_agent(message: str) -> List[Dict[str, Any]]:
-    """Run the agent with a message. Returns all messages as JSON array."""
+def get_agent() -> SimpleAgent:
+    """Return the global agent, creating it on first use."""
     if _agent is None:
-        raise RuntimeError("Agent not created. Call create_agent() first.")
-    return _agent.run(message)
+        with _agent_lock:
+            if _agent is None:
+                with tracing.span("agent.create"):
+                    create_agent()
+    return _agent
+
+
+def run_agent(message: str, session_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Run the agent with a message. Returns all messages as JSON array."""
+    return get_agent().run(message, session_id)
+
+
+def submit_agent(message: str, session_id: Optional[str] = None) -> Future:
+    """Run the agent asynchronously on the shared runtime loop. Returns a Future of the messages."""
+    return _runtime.submit(get_agent().arun(message, session_id))
+
+
+def start_agent_run(message: str, session_id: Optional[str] = None) -> str:
+    """Start an async agent run in the background and return its run id (see get_agent_run)."""
+    return _runs.add(submit_agent(message, session_id), session_id=session_id)
+
+
+def get_agent_run(run_id: str) -> Optional[Dict[str, Any]]:
+    """Status of a background run: {"status": "running" | "done" | "error", ...}, or None if unknown.
+    
+    A finished run has its messages under "result" and a failed one its "error".
+    """
+    return _runs.status(run_id)
+
+
+def get_scheduler_stats() -> Dict[str, Any]:
+    """In-flight and queued LLM calls of async agent runs."""
+    return get_agent().scheduler.stats()
+
+
+def stream_agent(message: str, session_id: Optional[str] = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Run the agent with a message, yielding (event, data) pairs as they happen."""
+    return get_agent().stream(message, session_id)
 
 
 def get_tools() -> List[str]:
     """Get list of available tool names."""
-    if _agent is None:
-        raise RuntimeError("Agent not created. Call create_agent() first.")
-    return list(_agent.tools.keys())
+    return list(get_agent().tools.keys())
@@ -0,0 +1,160 @@
+"""LLM backends for SimpleAgent, selected by the AGENT_LLM_BACKEND setting.
+
+Backends:
+    remote: OpenAI-compatible hosted API (Groq by default)
+    local:  OpenAI-compatible server on this machine (llama.cpp, vLLM, Ollama, ...)
+    stub:   ScriptedChatModel - replays a recorded script offline, with a fixed latency
+
+Settings (environment / .env):
+    AGENT_LLM_BACKEND   remote | local | stub (default: remote)
+    AGENT_LLM_MODEL, AGENT_LLM_BASE_URL, GROQ_API_KEY          - remote backend
+    LOCAL_LLM_MODEL, LOCAL_LLM_BASE_URL, LOCAL_LLM_API_KEY     - local backend
+    STUB_LLM_SCRIPT (JSON file), STUB_LLM_LATENCY (seconds)    - stub backend
+
+A stub script is a JSON list of turns. Turn N is the reply to the N-th LLM
+call after the latest user message; "{input}" in string arguments is replaced
+by that message. Once the script runs out, the last turn is repeated without
+tool calls so every run ends.
+
+    [
+      {"tool_calls": [{"name": "search_tasks", "args": {"query": "{input}"}}]},
+      {"content": "Here is what I found."}
+    ]
+"""
+import asyncio
+import json
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AnyMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+DEFAULT_STUB_SCRIPT = [
+    {"tool_calls": [{"name": "rag_context_for_query", "args": {"query": "{input}"}}]},
+    {"content": "Stub answer based on the retrieved context."}
+]
+
+# name -> factory returning a chat model
+LLM_BACKENDS: Dict[str, Callable[[], BaseChatModel]] = {}
+
+
+def register_backend(name: str):
+    """Register a chat model factory under a backend name."""
+    def decorator(factory: Callable[[], BaseChatModel]):
+        LLM_BACKENDS[name] = factory
+        return factory
+    return decorator
+
+
+def create_llm(backend: Optional[str] = None) -> BaseChatModel:
+    """Create the chat model for a backend (AGENT_LLM_BACKEND when not given)."""
+    name = backend or os.getenv("AGENT_LLM_BACKEND", "remote")
+    if name not in LLM_BACKENDS:
+        raise ValueError(f"Unknown LLM backend '{name}'. Available: {', '.join(sorted(LLM_BACKENDS))}")
+    return LLM_BACKENDS[name]()
+
+
+class ScriptedChatModel(BaseChatModel):
+    """Deterministic chat model that replays a script of turns (see module docstring).
+    
+    The turn is derived from the conversation itself, so concurrent runs do not
+    share any state.
+    """
+    
+    script: List[Dict[str, Any]]
+    latency: float = 0.0
+    
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-stub"
+    
+    @classmethod
+    def from_file(cls, path: Optional[str] = None, latency: float = 0.0) -> "ScriptedChatModel":
+        """Load a script from a JSON file, or use DEFAULT_STUB_SCRIPT."""
+        script = DEFAULT_STUB_SCRIPT
+        if path:
+            with open(path) as f:
+                script = json.load(f)
+        return cls(script=script, latency=latency)
+    
+    def _reply(self, messages: List[AnyMessage]) -> AIMessage:
+        """Build the scripted reply for the current point of the conversation."""
+        user_input = ""
+        since_user = []
+        for message in reversed(messages):
+            if isinstance(message, HumanMessage):
+                user_input = str(message.content)
+                break
+            since_user.append(message)
+        replies = [m for m in since_user if isinstance(m, AIMessage)]
+        turn = len(replies)
+        # Scripted tool calls carry their turn in the id ("call_<turn>_<i>"), which
+        # still holds once budget_messages has dropped earlier steps of the turn
+        last_call = replies[0].tool_calls[0]["id"] if replies and replies[0].tool_calls else ""
+        if last_call.startswith("call_"):
+            turn = int(last_call.split("_")[1]) + 1
+        
+        if turn < len(self.script):
+            step = self.script[turn]
+            tool_calls = step.get("tool_calls", [])
+        else:
+            step = self.script[-1]
+            tool_calls = []
+        
+        def fill(value):
+            return value.replace("{input}", user_input) if isinstance(value, str) else value
+        
+        return AIMessage(
+            content=fill(step.get("content", "")),
+            tool_calls=[
+                {
+                    "name": call["name"],
+                    "args": {k: fill(v) for k, v in call.get("args", {}).items()},
+                    "id": f"call_{turn}_{i}",
+                    "type": "tool_call"
+                }
+                for i, call in enumerate(tool_calls)
+            ]
+        )
+    
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if self.latency:
+            time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._reply(messages))])
+    
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._reply(messages))])
+
+
+@register_backend("remote")
+def _remote_llm() -> BaseChatModel:
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(
+        model=os.getenv("AGENT_LLM_MODEL", "openai/gpt-oss-120b"),
+        api_key=os.getenv("GROQ_API_KEY"),
+        base_url=os.getenv("AGENT_LLM_BASE_URL", "https://api.groq.com/openai/v1"),
+        temperature=0.0
+    )
+
+
+@register_backend("local")
+def _local_llm() -> BaseChatModel:
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(
+        model=os.getenv("LOCAL_LLM_MODEL", "local-model"),
+        api_key=os.getenv("LOCAL_LLM_API_KEY", "not-needed"),
+        base_url=os.getenv("LOCAL_LLM_BASE_URL", "http://localhost:8080/v1"),
+        temperature=0.0
+    )
+
+
+@register_backend("stub")
+def _stub_llm() -> BaseChatModel:
+    return ScriptedChatModel.from_file(
+        os.getenv("STUB_LLM_SCRIPT"),
+        latency=float(os.getenv("STUB_LLM_LATENCY", "0"))
+    )
@@ -0,0 +1,193 @@
+"""Optional response cache for SimpleAgent LLM calls.
+
+An LLM call is identified by a hash of the model name, the bound tool schemas
+and the normalized message list (types, text and tool calls; ids ignored).
+Entries live in an in-memory LRU backed by a SQLite file, so they survive
+restarts.
+
+Only conversations that used read-only tools are cached. Each entry is tagged
+with the entity types its tools touched (TOOL_ENTITIES), and running a write
+tool invalidates every entry tagged with an entity type it changes.
+
+Settings (environment / .env):
+    AGENT_LLM_CACHE       "1" to enable (default off)
+    AGENT_LLM_CACHE_PATH  SQLite file (default llm_cache.sqlite3 in the ChromaDB PERSIST_DIR)
+    AGENT_LLM_CACHE_SIZE  in-memory entries (default 256)
+    AGENT_LLM_CACHE_TTL   seconds an entry stays valid (default 86400)
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from langchain_core.messages import AIMessage, AnyMessage, ToolMessage, messages_from_dict, messages_to_dict
+
+from app.db.chroma_manager import PERSIST_DIR
+
+LLM_CACHE_ENABLED = os.getenv("AGENT_LLM_CACHE", "0").lower() in ("1", "true", "yes")
+LLM_CACHE_PATH = os.getenv("AGENT_LLM_CACHE_PATH", os.path.join(PERSIST_DIR, "llm_cache.sqlite3"))
+LLM_CACHE_SIZE = int(os.getenv("AGENT_LLM_CACHE_SIZE", "256"))
+LLM_CACHE_TTL = float(os.getenv("AGENT_LLM_CACHE_TTL", "86400"))
+
+# Entity types each tool reads or changes
+TOOL_ENTITIES: Dict[str, Set[str]] = {
+    "search_tasks": {"tasks"},
+    "get_task_chroma": {"tasks"},
+    "search_notes": {"notes"},
+    "get_note_chroma": {"notes"},
+    "rag_context_for_query": {"tasks", "notes"},
+    "create_task": {"tasks"},
+    "update_task": {"tasks"},
+    "delete_task": {"tasks", "notes"},
+    "create_note": {"notes"},
+    "update_note": {"notes"},
+    "delete_note": {"notes", "tasks"},
+    "add_note_to_task": {"tasks", "notes"},
+    "remove_note_from_task": {"tasks", "notes"},
+}
+
+
+def _normalize_text(content: Any) -> Any:
+    if isinstance(content, str):
+        return " ".join(content.split())
+    return content
+
+
+def _normalize_messages(messages: List[AnyMessage]) -> List[Dict[str, Any]]:
+    """Reduce messages to what affects the answer (no ids or metadata)."""
+    normalized = []
+    for message in messages:
+        item = {"type": message.type, "content": _normalize_text(message.content)}
+        if isinstance(message, AIMessage) and message.tool_calls:
+            item["tool_calls"] = [{"name": c["name"], "args": c.get("args", {})} for c in message.tool_calls]
+        if isinstance(message, ToolMessage):
+            item["name"] = message.name
+        normalized.append(item)
+    return normalized
+
+
+def tools_used(messages: Iterable[AnyMessage]) -> Set[str]:
+    """Names of every tool called in a list of messages."""
+    names = set()
+    for message in messages:
+        if isinstance(message, AIMessage):
+            names.update(call["name"] for call in message.tool_calls)
+    return names
+
+
+class LLMResponseCache:
+    """Two-tier (memory LRU + SQLite) cache of LLM responses with entity invalidation."""
+    
+    def __init__(self, path: str = LLM_CACHE_PATH, max_size: int = LLM_CACHE_SIZE, ttl: float = LLM_CACHE_TTL,
+                 read_only_tools: Iterable[str] = (), tool_entities: Optional[Dict[str, Set[str]]] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.read_only_tools = set(read_only_tools)
+        self.tool_entities = tool_entities if tool_entities is not None else TOOL_ENTITIES
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires_at, message dict, entities)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, message TEXT NOT NULL, entities TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+    
+    def key(self, model: str, tool_schemas: List[Dict[str, Any]], messages: List[AnyMessage]) -> str:
+        """Hash of everything that determines the LLM response."""
+        payload = json.dumps(
+            {"model": model, "tools": tool_schemas, "messages": _normalize_messages(messages)},
+            sort_keys=True, default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def get(self, key: str) -> Optional[AIMessage]:
+        """Get a cached response, checking memory first and then SQLite."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[0] < now:
+                del self._memory[key]
+                entry = None
+            if entry is None:
+                row = self._conn.execute(
+                    "SELECT expires_at, message, entities FROM responses WHERE key = ? AND expires_at >= ?",
+                    (key, now)
+                ).fetchone()
+                if row:
+                    entry = (row[0], json.loads(row[1]), set(json.loads(row[2])))
+                    self._remember(key, entry)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._memory.move_to_end(key)
+            self.hits += 1
+        return messages_from_dict([entry[1]])[0]
+    
+    def put(self, key: str, messages: List[AnyMessage], response: AIMessage) -> bool:
+        """Cache a response if the conversation only used read-only tools. Returns True if stored."""
+        used = tools_used(list(messages) + [response])
+        if not used <= self.read_only_tools:
+            return False
+        entities = set()
+        for name in used:
+            entities |= self.tool_entities.get(name, set())
+        
+        entry = (time.time() + self.ttl, messages_to_dict([response])[0], entities)
+        with self._lock:
+            self._remember(key, entry)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, message, entities, expires_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(entry[1]), json.dumps(sorted(entities)), entry[0])
+            )
+            self._conn.commit()
+        return True
+    
+    def _remember(self, key: str, entry: tuple) -> None:
+        """Put an entry in the memory tier. Call with the lock held."""
+        if self.max_size <= 0:
+            return
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_size:
+            self._memory.popitem(last=False)
+    
+    def invalidate_tool(self, tool_name: str) -> int:
+        """Drop entries made stale by running a (write) tool. Returns how many were dropped."""
+        if tool_name in self.read_only_tools:
+            return 0
+        dropped = 0
+        for entity in self.tool_entities.get(tool_name, set()):
+            dropped += self.invalidate(entity)
+        return dropped
+    
+    def invalidate(self, entity: str) -> int:
+        """Drop every entry that touched an entity type. Returns how many were dropped."""
+        with self._lock:
+            stale = [key for key, entry in self._memory.items() if entity in entry[2]]
+            for key in stale:
+                del self._memory[key]
+            cursor = self._conn.execute("DELETE FROM responses WHERE entities LIKE ?", (f'%"{entity}"%',))
+            self._conn.execute("DELETE FROM responses WHERE expires_at < ?", (time.time(),))
+            self._conn.commit()
+            dropped = max(len(stale), cursor.rowcount)
+            self.invalidations += dropped
+        return dropped
+    
+    def stats(self) -> Dict[str, Any]:
+        """Size and counters."""
+        with self._lock:
+            stored = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            return {"memory_size": len(self._memory), "stored": stored, "hits": self.hits,
+                    "misses": self.misses, "invalidations": self.invalidations}
@@ -0,0 +1,165 @@
+"""Async runtime pieces for the agent.
+
+- LLMScheduler limits how many LLM calls are in flight and queues the rest
+  in FIFO order.
+- AsyncRuntime owns one background event loop that async agent runs share,
+  so the scheduler sees every call (it must be used from a single loop).
+- RunRegistry keeps the futures of submitted runs by run id, so a request
+  can return at once and the result is polled later.
+"""
+import asyncio
+import contextvars
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from contextlib import asynccontextmanager
+from typing import Any, Coroutine, Deque, Dict, Optional, Tuple
+
+LLM_MAX_CONCURRENCY = int(os.getenv("AGENT_LLM_CONCURRENCY", "4"))
+# Seconds a finished run's result is kept for polling
+RUN_RESULT_TTL = float(os.getenv("AGENT_RUN_RESULT_TTL", "600"))
+MAX_RUNS = int(os.getenv("AGENT_MAX_RUNS", "1000"))
+
+
+class LLMScheduler:
+    """Bounded concurrency for LLM calls with a fair (FIFO) wait queue."""
+    
+    def __init__(self, max_concurrent: int = LLM_MAX_CONCURRENCY):
+        self.max_concurrent = max(1, max_concurrent)
+        self._in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.completed = 0
+    
+    @asynccontextmanager
+    async def slot(self):
+        """Hold one LLM slot for the duration of the block."""
+        await self._acquire()
+        try:
+            yield
+        finally:
+            self._release()
+    
+    async def _acquire(self) -> None:
+        if self._in_flight < self.max_concurrent and not self.queue_depth:
+            self._in_flight += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            # _release hands its slot over by resolving the waiter
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was already handed to us; pass it on
+                self._release()
+            raise
+    
+    def _release(self) -> None:
+        self.completed += 1
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._in_flight -= 1
+    
+    @property
+    def queue_depth(self) -> int:
+        """Number of calls waiting for a slot."""
+        return sum(1 for waiter in self._waiters if not waiter.done())
+    
+    def stats(self) -> Dict[str, Any]:
+        """Current load of the scheduler."""
+        return {
+            "max_concurrent": self.max_concurrent,
+            "in_flight": self._in_flight,
+            "queue_depth": self.queue_depth,
+            "completed": self.completed
+        }
+
+
+class AsyncRuntime:
+    """A background thread running the event loop shared by async agent runs."""
+    
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+    
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """Get the runtime loop, starting its thread on first use."""
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="agent-runtime", daemon=True).start()
+                self._loop = loop
+        return self._loop
+    
+    def submit(self, coro: Coroutine) -> Future:
+        """Schedule a coroutine on the runtime loop and return a concurrent Future.
+        
+        The coroutine sees the caller's context variables (e.g. the request's trace span).
+        """
+        return asyncio.run_coroutine_threadsafe(_with_context(coro, contextvars.copy_context()), self.loop())
+
+
+async def _with_context(coro: Coroutine, context: contextvars.Context) -> Any:
+    """Await a coroutine with the variables of another context set in this task's context."""
+    for var, value in context.items():
+        var.set(value)
+    return await coro
+
+
+class RunRegistry:
+    """Submitted runs by id. Finished runs are dropped after `ttl` seconds or when over `max_runs`."""
+    
+    def __init__(self, ttl: float = RUN_RESULT_TTL, max_runs: int = MAX_RUNS):
+        self.ttl = ttl
+        self.max_runs = max_runs
+        self._runs: "OrderedDict[str, Tuple[Future, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def add(self, future: Future, **info) -> str:
+        """Register a run and return its id. `info` is returned with every status."""
+        run_id = secrets.token_hex(8)
+        with self._lock:
+            self._prune()
+            self._runs[run_id] = (future, info)
+        future.add_done_callback(lambda _: self._finished(run_id))
+        return run_id
+    
+    def status(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """{"status": "running" | "done" | "error", ...} for a run, or None if unknown or expired."""
+        with self._lock:
+            self._prune()
+            entry = self._runs.get(run_id)
+        if entry is None:
+            return None
+        future, info = entry
+        status = {"run_id": run_id, **{k: v for k, v in info.items() if k != "finished_at"}}
+        if not future.done():
+            return {**status, "status": "running"}
+        error = future.exception()
+        if error is not None:
+            return {**status, "status": "error", "error": str(error)}
+        return {**status, "status": "done", "result": future.result()}
+    
+    def _finished(self, run_id: str) -> None:
+        with self._lock:
+            entry = self._runs.get(run_id)
+            if entry is not None:
+                entry[1]["finished_at"] = time.monotonic()
+    
+    def _prune(self) -> None:
+        """Drop expired runs, then the oldest finished runs over max_runs. Call with the lock held."""
+        now = time.monotonic()
+        for run_id, (_, info) in list(self._runs.items()):
+            if "finished_at" in info and now - info["finished_at"] > self.ttl:
+                del self._runs[run_id]
+        for run_id, (_, info) in list(self._runs.items()):
+            if len(self._runs) <= self.max_runs:
+                break
+            if "finished_at" in info:
+                del self._runs[run_id]
@@ -0,0 +1,212 @@
+"""Conversation sessions and prompt budgeting for SimpleAgent.
+
+- SessionStore keeps each session's history compactly: only the user
+  messages and the agent's final answers, not the tool calls in between.
+  Sessions are stored in SQLite (SESSION_FILE in the ChromaDB persist
+  directory), so they are shared by all workers and agent instances.
+- budget_messages() bounds what is sent to the LLM on every call: large tool
+  results are shortened, and once the estimated token count exceeds the
+  budget the oldest tool steps of the current turn and then the oldest
+  turns are dropped (replaced by a one-line summary).
+
+Settings (environment / .env):
+    AGENT_PROMPT_TOKEN_BUDGET    estimated tokens of history per LLM call (default 6000)
+    AGENT_TOOL_RESULT_MAX_CHARS  longest tool result sent to the LLM (default 4000)
+    AGENT_SESSION_MAX_TURNS      turns kept per session (default 20)
+    AGENT_SESSION_TTL            seconds an idle session is kept (default 3600)
+    AGENT_MAX_SESSIONS           sessions kept (default 1000)
+"""
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Tuple
+
+from langchain_core.messages import AIMessage, AnyMessage, HumanMessage, SystemMessage, ToolMessage
+
+PROMPT_TOKEN_BUDGET = int(os.getenv("AGENT_PROMPT_TOKEN_BUDGET", "6000"))
+TOOL_RESULT_MAX_CHARS = int(os.getenv("AGENT_TOOL_RESULT_MAX_CHARS", "4000"))
+SESSION_MAX_TURNS = int(os.getenv("AGENT_SESSION_MAX_TURNS", "20"))
+SESSION_TTL = float(os.getenv("AGENT_SESSION_TTL", "3600"))
+MAX_SESSIONS = int(os.getenv("AGENT_MAX_SESSIONS", "1000"))
+
+SESSION_FILE = "sessions.sqlite3"
+
+# Rough size of a token in characters, good enough for budgeting
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(message: AnyMessage) -> int:
+    """Cheap token estimate of a message (text plus tool call arguments)."""
+    size = len(str(message.content))
+    if isinstance(message, AIMessage):
+        size += sum(len(str(call.get("args", {}))) + len(call["name"]) for call in message.tool_calls)
+    return size // CHARS_PER_TOKEN + 1
+
+
+def shorten(text: str, max_chars: int) -> str:
+    """Cut a long text, noting how much was left out."""
+    if len(text) <= max_chars:
+        return text
+    return f"{text[:max_chars]}... [truncated {len(text) - max_chars} chars]"
+
+
+def _split_steps(turn: List[AnyMessage]) -> Tuple[List[AnyMessage], List[List[AnyMessage]]]:
+    """Split a turn into its leading messages and its steps (an AIMessage plus the tool results after it)."""
+    start = next((i for i, m in enumerate(turn) if isinstance(m, AIMessage)), len(turn))
+    steps: List[List[AnyMessage]] = []
+    for message in turn[start:]:
+        if isinstance(message, AIMessage) or not steps:
+            steps.append([])
+        steps[-1].append(message)
+    return turn[:start], steps
+
+
+def budget_messages(messages: List[AnyMessage], budget: int = PROMPT_TOKEN_BUDGET,
+                    tool_max_chars: int = TOOL_RESULT_MAX_CHARS) -> List[AnyMessage]:
+    """Bound the messages sent to the LLM.
+    
+    Tool results longer than tool_max_chars are shortened. Messages are then
+    grouped into turns (a user message and everything after it). In the
+    latest turn the user message and the latest step (an AIMessage with its
+    tool results) are always kept, and earlier steps are added newest first
+    while they fit the budget, so a long tool loop stays bounded. Older turns
+    are then added the same way. Dropped steps and turns are replaced by a
+    short summary of the tools called and the questions asked.
+    """
+    trimmed = []
+    for message in messages:
+        if isinstance(message, ToolMessage) and len(str(message.content)) > tool_max_chars:
+            message = message.model_copy(update={"content": shorten(str(message.content), tool_max_chars)})
+        trimmed.append(message)
+    
+    turns: List[List[AnyMessage]] = []
+    for message in trimmed:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    if not turns:
+        return []
+    
+    head, steps = _split_steps(turns[-1])
+    used = sum(estimate_tokens(m) for m in head)
+    kept_steps: List[List[AnyMessage]] = []
+    while steps:
+        cost = sum(estimate_tokens(m) for m in steps[-1])
+        if kept_steps and used + cost > budget:
+            break
+        used += cost
+        kept_steps.insert(0, steps.pop())
+    
+    kept = [head + [m for step in kept_steps for m in step]]
+    dropped = turns[:-1]
+    while dropped and not steps:
+        cost = sum(estimate_tokens(m) for m in dropped[-1])
+        if used + cost > budget:
+            break
+        used += cost
+        kept.insert(0, dropped.pop())
+    
+    result = [m for turn in kept for m in turn]
+    notes = []
+    if dropped:
+        questions = [shorten(str(turn[0].content), 80) for turn in dropped if isinstance(turn[0], HumanMessage)]
+        notes.append(f"{len(dropped)} earlier turn(s) omitted. The user previously asked: " + "; ".join(questions))
+    if steps:
+        calls = [call["name"] for step in steps for call in getattr(step[0], "tool_calls", [])]
+        notes.append(f"{len(steps)} earlier tool step(s) of the current request omitted. Tools already called: "
+                     + ", ".join(calls))
+    if notes:
+        result.insert(0, SystemMessage(content=shorten(" ".join(notes), 200 * CHARS_PER_TOKEN)))
+    return result
+
+
+class SessionStore:
+    """Conversation histories keyed by session id, persisted in SQLite.
+    
+    The file lives next to the Chroma data, so every worker process and every
+    agent instance (create_agent) sees the same sessions and they survive
+    restarts. A session expires once it has been idle for `ttl` seconds; past
+    `max_sessions` the least recently used sessions are dropped.
+    """
+    
+    def __init__(self, persist_dir: str, max_turns: int = SESSION_MAX_TURNS, ttl: float = SESSION_TTL,
+                 max_sessions: int = MAX_SESSIONS):
+        os.makedirs(persist_dir, exist_ok=True)
+        self.path = os.path.join(persist_dir, SESSION_FILE)
+        self.max_turns = max_turns
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        with self._lock:
+            conn = self._connection()
+            conn.execute("CREATE TABLE IF NOT EXISTS sessions (session_id TEXT PRIMARY KEY, updated REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS session_turns ("
+                "session_id TEXT NOT NULL, question TEXT NOT NULL, answer TEXT NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS session_turns_session ON session_turns (session_id)")
+    
+    def _connection(self) -> sqlite3.Connection:
+        """Get this process's connection (reopened after a fork). Call with the lock held."""
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._pid = os.getpid()
+        return self._conn
+    
+    def load(self, session_id: str) -> List[AnyMessage]:
+        """Get the stored history of a session as messages (empty for a new or expired session)."""
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT question, answer FROM session_turns WHERE session_id = ? AND EXISTS "
+                "(SELECT 1 FROM sessions WHERE session_id = ? AND updated >= ?) ORDER BY rowid",
+                (session_id, session_id, time.time() - self.ttl)
+            ).fetchall()
+        history = []
+        for question, answer in rows:
+            history.append(HumanMessage(content=question))
+            history.append(AIMessage(content=answer))
+        return history
+    
+    def append(self, session_id: str, question: str, answer: str) -> None:
+        """Record one finished turn of a session, dropping expired and least recently used sessions."""
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Expired sessions (this one included) start over
+                stale = ("SELECT session_id FROM sessions WHERE updated < ? UNION "
+                         "SELECT session_id FROM (SELECT session_id FROM sessions ORDER BY updated DESC LIMIT -1 OFFSET ?)")
+                params = (now - self.ttl, max(self.max_sessions - 1, 0))
+                conn.execute(f"DELETE FROM session_turns WHERE session_id IN ({stale})", params)
+                conn.execute(f"DELETE FROM sessions WHERE session_id IN ({stale})", params)
+                conn.execute("INSERT OR REPLACE INTO sessions (session_id, updated) VALUES (?, ?)", (session_id, now))
+                conn.execute("INSERT INTO session_turns (session_id, question, answer) VALUES (?, ?, ?)",
+                             (session_id, question, answer))
+                conn.execute(
+                    "DELETE FROM session_turns WHERE session_id = ? AND rowid NOT IN "
+                    "(SELECT rowid FROM session_turns WHERE session_id = ? ORDER BY rowid DESC LIMIT ?)",
+                    (session_id, session_id, self.max_turns)
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+    
+    def clear(self, session_id: str) -> None:
+        """Forget a session."""
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("DELETE FROM session_turns WHERE session_id = ?", (session_id,))
+                conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
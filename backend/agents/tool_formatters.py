@@ -0,0 +1,122 @@
+"""Compact serialization of tool results for ToolMessages.
+
+Tool results are sent back to the LLM on every loop iteration, so each tool
+gets a formatter that keeps only the fields the model needs and emits compact
+JSON (no repr, no duplicated document/metadata). Long note content can be cut
+to a snippet with AGENT_TOOL_SNIPPET_CHARS (0 = full content, the default).
+"""
+import json
+import os
+from typing import Any, Callable, Dict, List, Optional
+
+SNIPPET_CHARS = int(os.getenv("AGENT_TOOL_SNIPPET_CHARS", "0"))
+
+
+def _snippet(text: Any, snippet_chars: int) -> str:
+    text = text or ""
+    if snippet_chars and len(text) > snippet_chars:
+        return text[:snippet_chars].rstrip() + "..."
+    return text
+
+
+def _related_ids(value: Any) -> List[int]:
+    """Related ids from metadata (stored as a JSON string) or from a list of {"id": ...}."""
+    if isinstance(value, str):
+        value = json.loads(value or "[]")
+    return [int(v["id"] if isinstance(v, dict) else v) for v in value or []]
+
+
+def _compact_task(task: Dict[str, Any]) -> Dict[str, Any]:
+    item = {"id": task.get("id"), "title": task.get("title", ""), "status": task.get("status", "")}
+    if task.get("deadline"):
+        item["deadline"] = task["deadline"]
+    if task.get("description"):
+        item["description"] = task["description"]
+    return item
+
+
+def _compact_note(note: Dict[str, Any], snippet_chars: int) -> Dict[str, Any]:
+    item = {"id": note.get("id"), "title": note.get("title", ""),
+            "content": _snippet(note.get("content"), snippet_chars)}
+    if note.get("created_at"):
+        item["created_at"] = note["created_at"][:10]
+    return item
+
+
+def _format_task_hits(hits: List[Dict[str, Any]], snippet_chars: int) -> Any:
+    return [_compact_task({**hit.get("metadata", {}), "id": hit.get("id")}) for hit in hits]
+
+
+def _format_note_hits(hits: List[Dict[str, Any]], snippet_chars: int) -> Any:
+    return [_compact_note({**hit.get("metadata", {}), "id": hit.get("id")}, snippet_chars) for hit in hits]
+
+
+def _format_task(task: Optional[Dict[str, Any]], snippet_chars: int) -> Any:
+    if not task:
+        return {"error": "task not found"}
+    item = _compact_task(task)
+    item["notes"] = [{"id": n["id"], "title": n.get("title", "")} for n in task.get("notes", [])]
+    return item
+
+
+def _format_note(note: Optional[Dict[str, Any]], snippet_chars: int) -> Any:
+    if not note:
+        return {"error": "note not found"}
+    item = _compact_note(note, snippet_chars)
+    item["tasks"] = _related_ids(note.get("tasks", []))
+    return item
+
+
+def _format_rag_context(context: Dict[str, Any], snippet_chars: int) -> Any:
+    items = []
+    for hit in context.get("items", []):
+        meta = {**(hit.get("meta") or {}), "id": hit.get("id")}
+        if hit.get("source") == "task":
+            item = _compact_task(meta)
+        else:
+            item = _compact_note(meta, snippet_chars)
+        items.append({"source": hit.get("source"), **item})
+    return {"query": context.get("query"), "items": items}
+
+
+def _format_id(result: Any, snippet_chars: int) -> Any:
+    return {"id": result}
+
+
+def _format_ok(result: Any, snippet_chars: int) -> Any:
+    return {"ok": True}
+
+
+# tool name -> formatter(result, snippet_chars) returning a JSON-serializable value
+TOOL_FORMATTERS: Dict[str, Callable[[Any, int], Any]] = {
+    "search_tasks": _format_task_hits,
+    "search_notes": _format_note_hits,
+    "get_task_chroma": _format_task,
+    "get_note_chroma": _format_note,
+    "rag_context_for_query": _format_rag_context,
+    "create_task": _format_id,
+    "create_note": _format_id,
+    "update_task": _format_ok,
+    "update_note": _format_ok,
+    "delete_task": _format_ok,
+    "delete_note": _format_ok,
+    "add_note_to_task": _format_ok,
+    "remove_note_from_task": _format_ok,
+}
+
+
+def format_tool_result(tool_name: str, result: Any, snippet_chars: int = SNIPPET_CHARS) -> str:
+    """Serialize a tool result as compact JSON for a ToolMessage.
+    
+    Plain strings (e.g. error messages) are returned unchanged.
+    """
+    if isinstance(result, str):
+        return result
+    formatter = TOOL_FORMATTERS.get(tool_name)
+    if formatter is not None:
+        try:
+            result = formatter(result, snippet_chars)
+        except (AttributeError, KeyError, TypeError, ValueError):
+            # Unexpected shape: fall back to the raw result
+            pass
+    return json.dumps(result, ensure_ascii=False, separators=(",", ":"), default=str)
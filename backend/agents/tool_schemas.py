@@ -0,0 +1,166 @@
+"""Tool registry and JSON schemas for the agent.
+
+Schemas are built from the signatures and docstrings of the functions in a
+tools module (``chroma_tools``) and cached to a JSON file keyed by a hash of
+the module source, so they are only regenerated when the tools change.
+"""
+import hashlib
+import inspect
+import json
+import os
+import re
+import threading
+from typing import Any, Callable, Dict, List, Tuple, Union, get_args, get_origin, get_type_hints
+
+from app.db.chroma_manager import PERSIST_DIR
+
+# Cache file for generated schemas (AGENT_TOOL_SCHEMA_CACHE="" disables it)
+TOOL_SCHEMA_CACHE = os.getenv("AGENT_TOOL_SCHEMA_CACHE", os.path.join(PERSIST_DIR, "tool_schemas.json"))
+# Bump when the generated schema format changes
+SCHEMA_VERSION = "1"
+
+_SIMPLE_TYPES = {
+    str: "string",
+    int: "integer",
+    float: "number",
+    bool: "boolean",
+    dict: "object",
+}
+
+# Schemas per tools module, built/loaded once per process
+_registry: Dict[str, Tuple[Dict[str, Callable], List[Dict[str, Any]]]] = {}
+_registry_lock = threading.Lock()
+
+
+def tool_functions(module) -> Dict[str, Callable]:
+    """Public functions defined in the module itself (imported helpers are skipped)."""
+    return {
+        name: func
+        for name, func in inspect.getmembers(module, inspect.isfunction)
+        if not name.startswith("_") and func.__module__ == module.__name__
+    }
+
+
+def json_type(annotation) -> Dict[str, Any]:
+    """JSON schema for a type annotation. Optional[X] maps to the schema of X."""
+    origin = get_origin(annotation)
+    if origin is Union:
+        args = [a for a in get_args(annotation) if a is not type(None)]
+        if len(args) == 1:
+            return json_type(args[0])
+        return {"anyOf": [json_type(a) for a in args]}
+    if origin in (list, tuple, set):
+        args = get_args(annotation)
+        schema = {"type": "array"}
+        if args and args[0] is not Any:
+            schema["items"] = json_type(args[0])
+        return schema
+    if origin is dict:
+        return {"type": "object"}
+    if annotation in _SIMPLE_TYPES:
+        return {"type": _SIMPLE_TYPES[annotation]}
+    return {"type": "string"}
+
+
+def parse_docstring(doc: str) -> Tuple[str, Dict[str, str], str]:
+    """Split a Google-style docstring into (summary, {arg: description}, returns)."""
+    summary, args, returns = [], {}, []
+    section, current = None, None
+    for line in inspect.cleandoc(doc or "").splitlines():
+        stripped = line.strip()
+        if stripped in ("Args:", "Arguments:", "Parameters:"):
+            section = "args"
+            continue
+        if stripped in ("Returns:", "Return:"):
+            section = "returns"
+            continue
+        if section == "args":
+            match = re.match(r"^(\w+)(?:\s*\([^)]*\))?:\s*(.*)$", stripped)
+            if match and not line.startswith(" " * 8):
+                current = match.group(1)
+                args[current] = match.group(2)
+            elif stripped and current:
+                args[current] += " " + stripped
+        elif section == "returns":
+            if stripped:
+                returns.append(stripped)
+        elif stripped:
+            summary.append(stripped)
+    return " ".join(summary), args, " ".join(returns)
+
+
+def build_tool_schema(name: str, func: Callable) -> Dict[str, Any]:
+    """OpenAI-style function schema for one tool."""
+    summary, arg_docs, returns = parse_docstring(func.__doc__)
+    hints = get_type_hints(func)
+    properties, required = {}, []
+    for param_name, param in inspect.signature(func).parameters.items():
+        prop = json_type(hints.get(param_name, str))
+        if param_name in arg_docs:
+            prop["description"] = arg_docs[param_name]
+        if param.default is inspect.Parameter.empty:
+            required.append(param_name)
+        elif param.default is not None:
+            prop["default"] = param.default
+        properties[param_name] = prop
+
+    description = summary or f"Call the {name} function"
+    if returns:
+        description += f" Returns: {returns}"
+    return {
+        "type": "function",
+        "function": {
+            "name": name,
+            "description": description,
+            "parameters": {"type": "object", "properties": properties, "required": required},
+        },
+    }
+
+
+def _source_hash(module) -> str:
+    """Hash of the module source plus the schema format version."""
+    digest = hashlib.sha256(SCHEMA_VERSION.encode())
+    try:
+        with open(inspect.getsourcefile(module), "rb") as f:
+            digest.update(f.read())
+    except (OSError, TypeError):
+        digest.update(module.__name__.encode())
+    return digest.hexdigest()
+
+
+def _read_cache(path: str, key: str):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+        return cached.get(key)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _write_cache(path: str, key: str, schemas: List[Dict[str, Any]]) -> None:
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({key: schemas}, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Error writing tool schema cache: {e}")
+
+
+def load_tool_registry(module, cache_path: str = TOOL_SCHEMA_CACHE) -> Tuple[Dict[str, Callable], List[Dict[str, Any]]]:
+    """Return ({name: function}, schemas) for a tools module, using the file cache when it is current."""
+    with _registry_lock:
+        if module.__name__ in _registry:
+            return _registry[module.__name__]
+
+        tools = tool_functions(module)
+        key = f"{module.__name__}:{_source_hash(module)}"
+        schemas = _read_cache(cache_path, key) if cache_path else None
+        if schemas is None or [s["function"]["name"] for s in schemas] != list(tools):
+            schemas = [build_tool_schema(name, func) for name, func in tools.items()]
+            if cache_path:
+                _write_cache(cache_path, key, schemas)
+
+        _registry[module.__name__] = (tools, schemas)
+        return tools, schemas
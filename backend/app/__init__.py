@@ -1,12 +1,65 @@
-from flask import Flask, jsonify
+import time
+_import_start = time.perf_counter()
+
+from dotenv import load_dotenv
+
+# Before any app.* import: those modules read their settings from the environment at import time
+load_dotenv()
+
+from flask import Flask, Response, g, jsonify, request
 from app.routes_tasks import tasks_bp
 from app.routes_notes import notes_bp
+from app.routes_links import links_bp
 from app.routes_agents import agents_bp
 from flask_cors import CORS
 from app.db.chroma_manager import get_chroma_manager
 from app.utils.seed import seed_data
+from app.utils import metrics, startup, tracing
 from app.api import api_bp
 import os
+import threading
+
+startup.record("import_app", time.perf_counter() - _import_start)
+
+# Endpoints that answer without touching storage (liveness/readiness probes)
+LIGHT_ENDPOINTS = {"index", "health_check", "prometheus_metrics", "api.health", "api.startup_timings"}
+
+_storage_ready = False
+_storage_lock = threading.Lock()
+
+
+def init_storage(load_model: bool = False):
+    """Open ChromaDB and seed it if empty. Runs once, on the first request that needs it."""
+    global _storage_ready
+    if _storage_ready and not load_model:
+        return
+    with _storage_lock:
+        manager = get_chroma_manager()
+        if load_model:
+            # The embedding model is otherwise loaded by the first write or search.
+            # Skip the embedding cache, which would answer without the model after the first run.
+            with startup.phase("embedding_model"):
+                manager.embedder.embed(["warm up"], use_cache=False)
+        if _storage_ready:
+            return
+        if manager.count_tasks() == 0:
+            print("No data found. Seeding database...")
+            with startup.phase("seed"):
+                seed_data()
+        _storage_ready = True
+
+
+def warm_up():
+    """Run every startup phase now: storage, embedding model and the agent."""
+    try:
+        init_storage(load_model=True)
+        with startup.phase("import_agent"):
+            from agents.agent_interface import get_agent
+        with startup.phase("agent"):
+            get_agent()
+    except Exception as e:
+        print(f"Error warming up: {e}")
+
 
 def create_app():
     app = Flask(__name__)
@@ -14,31 +67,90 @@ def create_app():
     app.config["SECRET_KEY"] = os.getenv("SECRET_KEY", "default_secret_key")
 
     # Configure CORS - allow all origins for development
-    CORS(app, 
+    CORS(app,
          resources={r"/*": {"origins": "*"}},
-         allow_headers=["Content-Type", "Authorization"],
+         allow_headers=["Content-Type", "Authorization", tracing.DEBUG_TIMING_HEADER, "traceparent"],
+         expose_headers=[tracing.DEBUG_TIMING_HEADER, "X-Request-Id"],
          methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
          supports_credentials=False)
 
-    # Initialize ChromaDB manager
-    manager = get_chroma_manager()
+    @app.before_request
+    def start_timer():
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def record_latency(response):
+        start = g.pop("request_start", None)
+        if start is not None:
+            # Label by URL rule (e.g. /tasks/<int:id>), not by path, to keep the series bounded
+            route = request.url_rule.rule if request.url_rule else "unmatched"
+            metrics.HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, method=request.method,
+                                                 route=route, status=response.status_code)
+        return response
+
+    # Traced requests (TRACE_FILE set, or X-Debug-Timing sent) get a root span; see app.utils.tracing
+    @app.before_request
+    def start_trace():
+        if tracing.TRACE_FILE or request.headers.get(tracing.DEBUG_TIMING_HEADER, "0") not in ("", "0"):
+            route = request.url_rule.rule if request.url_rule else "unmatched"
+            g.trace = tracing.start_trace(f"{request.method} {route}", request.headers.get("traceparent"),
+                                          **{"http.request.method": request.method, "http.route": route,
+                                             "url.path": request.path})
+
+    @app.after_request
+    def end_trace(response):
+        root = g.pop("trace", None)
+        if root is not None:
+            root.set_attribute("http.response.status_code", response.status_code)
+            if response.status_code >= 500:
+                root.error = response.status
+            response.headers["X-Request-Id"] = root.trace.trace_id
+            if response.is_streamed:
+                # The body runs after this hook (see tracing.stream_in_span); end the trace once it is sent
+                tracing.detach(root)
+                response.call_on_close(lambda: tracing.end_trace(root))
+                return response
+            tracing.end_trace(root)
+            if request.headers.get(tracing.DEBUG_TIMING_HEADER, "0") not in ("", "0"):
+                response.headers[tracing.DEBUG_TIMING_HEADER] = root.trace.timing_header(root)
+        return response
+
+    @app.teardown_request
+    def close_trace(error=None):
+        # after_request is skipped when a request fails outside the error handlers
+        root = g.pop("trace", None)
+        if root is not None:
+            root.error = str(error) if error else None
+            tracing.end_trace(root)
 
-    # Seed if empty
-    if not manager.get_all_tasks():
-        print("No data found. Seeding database...")
-        seed_data()
+    # ChromaDB is opened (and seeded if empty) lazily, see init_storage
+    @app.before_request
+    def ensure_storage():
+        if request.endpoint not in LIGHT_ENDPOINTS:
+            init_storage()
 
     app.register_blueprint(tasks_bp, url_prefix="/tasks")
     app.register_blueprint(notes_bp, url_prefix="/notes")
+    app.register_blueprint(links_bp, url_prefix="/links")
     app.register_blueprint(agents_bp, url_prefix="/agents")
     app.register_blueprint(api_bp, url_prefix="/api")
-    
+
     @app.route("/")
     def index():
         return jsonify({"message": "Flask API is running", "status": "ok"})
-    
+
     @app.route("/health")
     def health_check():
         return jsonify({"status": "healthy", "api": "tasks-notes-crud"})
 
-    return app
\ No newline at end of file
+    @app.route("/metrics")
+    def prometheus_metrics():
+        return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+    if startup.STARTUP_PROFILE:
+        warm_up()
+        print(startup.report())
+    elif startup.STARTUP_WARMUP:
+        threading.Thread(target=warm_up, name="startup-warmup", daemon=True).start()
+
+    return app
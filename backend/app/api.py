@@ -1,7 +1,21 @@
 from flask import Blueprint, jsonify
+from app.db.chroma_manager import get_chroma_manager
+from app.utils import startup
 
 api_bp = Blueprint("api", __name__)
 
 @api_bp.route("/health")
 def health():
-    return jsonify({"status": "ok"})
\ No newline at end of file
+    return jsonify({"status": "ok"})
+
+
+@api_bp.route("/cache")
+def cache_stats():
+    manager = get_chroma_manager()
+    return jsonify(manager.cache_stats())
+
+
+@api_bp.route("/startup")
+def startup_timings():
+    """Milliseconds spent in each startup phase that has run so far."""
+    return jsonify(startup.timings())
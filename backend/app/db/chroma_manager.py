@@ -2,38 +2,189 @@
 
 This module follows DRY and KISS principles:
 - One place for all CRUD operations
-- Direct ChromaDB operations (no SQL layer)
+- Task and note records (documents, metadata, vectors) live in ChromaDB
+- Small SQLite files next to the Chroma data hold what Chroma cannot:
+  task-note links (RelationStore), id counters and finished migrations
+  (IdSequence) and previously computed vectors (EmbeddingCache)
 - Simple, clear functions
 """
-import chromadb
+import contextvars
+import functools
 import json
-from typing import List, Dict, Any, Optional
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Dict, Any, Optional, Tuple
 from datetime import datetime
+from app.db.embedding_cache import EMBEDDING_CACHE_ENABLED, EmbeddingCache
+from app.db.embeddings import (EmbeddingService, QueryEmbedder, default_embedding_function, default_model,
+                               embedding_model_id)
+from app.db.id_sequence import IdAllocator, IdSequence
+from app.db.lexical_index import LexicalIndex, reciprocal_rank_fusion
+from app.db.record_cache import RecordCache
+from app.db.relation_store import RelationStore
+from app.db.search_modes import SEARCH_MODE, SEARCH_MODES
+from app.utils import tracing
+from app.utils.dates import to_epoch
+from app.utils.metrics import CHROMA_OPERATION_ERRORS, CHROMA_OPERATION_SECONDS
+from app.utils.startup import phase
 
 PERSIST_DIR = "./chroma_persist"
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "256"))
+MAX_BATCH_SIZE = 5000
+RETRIEVAL_WORKERS = int(os.getenv("RETRIEVAL_WORKERS", "4"))
+# Hits taken from each ranking before hybrid fusion
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))
+
+
+def valid_batch_size(batch_size: Any) -> bool:
+    """True for a positive integer up to MAX_BATCH_SIZE (bools are not integers here)."""
+    return isinstance(batch_size, int) and not isinstance(batch_size, bool) and 1 <= batch_size <= MAX_BATCH_SIZE
+
+
+class TimedCollection:
+    """Collection proxy that records the latency and errors of each Chroma call (see metrics) and traces it."""
+    
+    OPERATIONS = {"add", "count", "delete", "get", "query", "update", "upsert"}
+    
+    def __init__(self, collection):
+        self._collection = collection
+        self.name = collection.name
+    
+    def __getattr__(self, attr: str):
+        value = getattr(self._collection, attr)
+        if attr not in self.OPERATIONS:
+            return value
+        
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                with tracing.span(f"chroma.{self.name}.{attr}", tracing.CLIENT, **{
+                        "db.system": "chromadb", "db.collection.name": self.name, "db.operation.name": attr}):
+                    return value(*args, **kwargs)
+            except Exception:
+                CHROMA_OPERATION_ERRORS.inc(collection=self.name, operation=attr)
+                raise
+            finally:
+                CHROMA_OPERATION_SECONDS.observe(time.perf_counter() - start, collection=self.name, operation=attr)
+        return timed
 
 
 class ChromaManager:
     """Singleton manager for ChromaDB operations."""
     
     def __init__(self):
-        self.client = chromadb.PersistentClient(path=PERSIST_DIR)
-        self.tasks_col = self._get_or_create_collection("tasks")
-        self.notes_col = self._get_or_create_collection("notes")
-        self._id_counter_tasks = self._get_max_id(self.tasks_col)
-        self._id_counter_notes = self._get_max_id(self.notes_col)
+        # chromadb is imported here, not at module level, so the app starts without it
+        with phase("import_chromadb"):
+            import chromadb
+        with phase("chroma_client"):
+            self.client = chromadb.PersistentClient(path=PERSIST_DIR)
+        # Configured on the collections; never called, since every call would load the model again
+        self.embedding_function = default_embedding_function()
+        # All vectors (documents and queries) are computed by the batching service
+        # with one shared model instance, reading documents embedded before from
+        # the persistent embedding cache. Queries only use the in-memory query cache.
+        self.model = default_model()
+        self.embedding_cache = (EmbeddingCache(PERSIST_DIR, embedding_model_id(self.model))
+                                if EMBEDDING_CACHE_ENABLED else None)
+        self.embedder = EmbeddingService(self.model, cache=self.embedding_cache)
+        self.query_embedder = QueryEmbedder(functools.partial(self.embedder.embed, use_cache=False))
+        with phase("collections"):
+            self.tasks_col = self._get_or_create_collection("tasks")
+            self.notes_col = self._get_or_create_collection("notes")
+            self.sequences = IdSequence(PERSIST_DIR)
+            self._init_sequence("tasks", self.tasks_col)
+            self._init_sequence("notes", self.notes_col)
+            self._init_epoch_metadata()
+            self._init_id_metadata()
+            self.relations = RelationStore(PERSIST_DIR)
+            self._init_relations()
+        self.ids = IdAllocator(self.sequences)
+        self.cache = RecordCache()
+        # BM25 keyword indexes, built on first search and kept current by every write
+        self.lexical = {"tasks": LexicalIndex(), "notes": LexicalIndex()}
+        # Shared pool for running collection queries concurrently
+        self.executor = ThreadPoolExecutor(max_workers=RETRIEVAL_WORKERS, thread_name_prefix="chroma-query")
     
     def _get_or_create_collection(self, name: str):
-        """Get or create a collection."""
+        """Get or create a collection (wrapped so every call is timed)."""
         try:
-            return self.client.get_collection(name=name)
+            collection = self.client.get_collection(name=name, embedding_function=self.embedding_function)
         except Exception:
-            return self.client.create_collection(name=name)
+            collection = self.client.create_collection(name=name, embedding_function=self.embedding_function)
+        return TimedCollection(collection)
+    
+    def _init_sequence(self, name: str, collection) -> None:
+        """Make sure the id sequence for a collection exists.
+        
+        Only data created before sequences were persisted needs the one-time
+        max-id scan; afterwards startup just reads the stored value.
+        """
+        if self.sequences.get(name) is not None:
+            return
+        start = self._get_max_id(collection) if collection.count() else 0
+        self.sequences.ensure(name, start)
+    
+    def _init_epoch_metadata(self) -> None:
+        """One-time migration: add deadline_ts / created_at_ts to records stored before date filters.
+        
+        Completion is recorded in the migrations table so it only runs once per persist directory.
+        """
+        if self.sequences.is_done("epoch_metadata"):
+            return
+        for collection, field in ((self.tasks_col, "deadline"), (self.notes_col, "created_at")):
+            result = collection.get(include=["metadatas"])
+            ids, metadatas = [], []
+            for record_id, meta in zip(result["ids"], result["metadatas"]):
+                seconds = to_epoch(meta.get(field))
+                if seconds is not None and f"{field}_ts" not in meta:
+                    ids.append(record_id)
+                    metadatas.append({f"{field}_ts": seconds})
+            if ids:
+                collection.update(ids=ids, metadatas=metadatas)
+        self.sequences.mark_done("epoch_metadata")
+    
+    def _init_id_metadata(self) -> None:
+        """One-time migration: add id_num (used by keyset pagination) to records stored before it."""
+        if self.sequences.is_done("id_metadata"):
+            return
+        for collection in (self.tasks_col, self.notes_col):
+            result = collection.get(include=["metadatas"])
+            ids = [record_id for record_id, meta in zip(result["ids"], result["metadatas"]) if "id_num" not in meta]
+            if ids:
+                collection.update(ids=ids, metadatas=[{"id_num": int(record_id)} for record_id in ids])
+        self.sequences.mark_done("id_metadata")
+    
+    def _init_relations(self) -> None:
+        """One-time migration: move related_notes / related_tasks metadata into the relation store.
+        
+        Links are taken from both sides and only kept when both records exist.
+        The old metadata keys are then removed (None deletes a key in Chroma).
+        """
+        if self.sequences.is_done("relations"):
+            return
+        tasks = self.tasks_col.get(include=["metadatas"])
+        notes = self.notes_col.get(include=["metadatas"])
+        task_ids, note_ids = set(tasks["ids"]), set(notes["ids"])
+        links = {}
+        for task_id, meta in zip(tasks["ids"], tasks["metadatas"]):
+            for note_id in json.loads(meta.get("related_notes") or "[]"):
+                links[(task_id, str(note_id))] = True
+        for note_id, meta in zip(notes["ids"], notes["metadatas"]):
+            for task_id in json.loads(meta.get("related_tasks") or "[]"):
+                links[(str(task_id), note_id)] = True
+        self.relations.apply([(int(t), int(n), True) for t, n in links if t in task_ids and n in note_ids])
+        for collection, result, key in ((self.tasks_col, tasks, "related_notes"), (self.notes_col, notes, "related_tasks")):
+            ids = [record_id for record_id, meta in zip(result["ids"], result["metadatas"]) if key in meta]
+            if ids:
+                collection.update(ids=ids, metadatas=[{key: None} for _ in ids])
+        self.sequences.mark_done("relations")
     
     def _get_max_id(self, collection) -> int:
         """Get the highest ID in a collection."""
         try:
-            result = collection.get()
+            result = collection.get(include=[])
             if result and result.get("ids"):
                 return max([int(id_str) for id_str in result["ids"]])
         except Exception:
@@ -42,313 +193,770 @@ class ChromaManager:
     
     def _next_task_id(self) -> int:
         """Generate next task ID."""
-        self._id_counter_tasks += 1
-        return self._id_counter_tasks
+        return self.ids.next("tasks")
     
     def _next_note_id(self) -> int:
         """Generate next note ID."""
-        self._id_counter_notes += 1
-        return self._id_counter_notes
+        return self.ids.next("notes")
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """Counters of the record cache, the embedding caches, the embedding batches and the lexical indexes."""
+        stats = {**self.cache.stats(), "query_embeddings": self.query_embedder.stats(),
+                 "embedding_service": self.embedder.stats(),
+                 "lexical_index": {name: index.stats() for name, index in self.lexical.items()}}
+        if self.embedding_cache is not None:
+            stats["embedding_cache"] = self.embedding_cache.stats()
+        return stats
+    
+    def count_tasks(self) -> int:
+        """Number of stored tasks (cheap, does not read records)."""
+        return self.tasks_col.count()
+    
+    def _task_document(self, title: str, description: str, status: str, deadline: Optional[str]) -> str:
+        """Build the text that gets embedded for a task."""
+        return f"{title}\n\n{description}\n\nStatus: {status}\nDeadline: {deadline or 'None'}"
+    
+    def _note_document(self, title: str, content: str) -> str:
+        """Build the text that gets embedded for a note."""
+        return f"{title}\n\n{content}"
+    
+    def _get_record(self, collection, record_id: int) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Get the stored document and metadata of a record, or None if missing."""
+        result = collection.get(ids=[str(record_id)], include=["documents", "metadatas"])
+        if not result["ids"]:
+            return None
+        return result["documents"][0], dict(result["metadatas"][0])
+    
+    def _get_metadata(self, collection, record_id: int) -> Optional[Dict[str, Any]]:
+        """Get the stored metadata of a record (read through the cache), or None if missing."""
+        key = (collection.name, str(record_id))
+        metadata = self.cache.get(key)
+        if metadata is None:
+            result = collection.get(ids=[str(record_id)], include=["metadatas"])
+            if not result["ids"]:
+                return None
+            metadata = dict(result["metadatas"][0])
+            self.cache.put(key, metadata)
+        return metadata
+    
+    def _write_record(self, collection, record_id: int, doc: str, metadata: Dict[str, Any],
+                      stored_doc: Optional[str] = None) -> None:
+        """Write a record, re-embedding only when the document text changed."""
+        if stored_doc is not None and doc == stored_doc:
+            collection.update(ids=[str(record_id)], metadatas=[metadata])
+        else:
+            collection.upsert(ids=[str(record_id)], documents=[doc], metadatas=[metadata],
+                              embeddings=self.embedder.embed([doc]))
+            self.lexical[collection.name].add(str(record_id), doc)
+        self.cache.put((collection.name, str(record_id)), metadata)
+    
+    def _get_page(self, collection, limit: Optional[int], cursor: Optional[str]) -> Tuple[Dict[str, Any], Optional[str]]:
+        """Read one page of metadata from a collection, in id order.
+        
+        The cursor is the last id of the previous page (a keyset cursor), so
+        records created or deleted between page reads do not shift later pages.
+        Chroma cannot sort, so ids above the cursor are looked up with id-only
+        gets over growing id_num ranges until one more than the page is found
+        or the range passes the id sequence; the page itself is then read
+        with one get by ids.
+        """
+        if limit is None:
+            return collection.get(include=["metadatas"]), None
+        
+        after = int(cursor) if cursor else 0
+        last_id = self.sequences.get(collection.name) or 0
+        ids: List[int] = []
+        low, span = after, max(2 * (limit + 1), 64)
+        while len(ids) <= limit and low < last_id:
+            high = low + span
+            window = collection.get(where={"$and": [{"id_num": {"$gt": low}}, {"id_num": {"$lte": high}}]},
+                                    include=[])
+            ids += sorted(int(record_id) for record_id in window["ids"])
+            low, span = high, span * 2
+        
+        page_ids = [str(record_id) for record_id in ids[:limit]]
+        if not page_ids:
+            return {"ids": [], "metadatas": []}, None
+        result = collection.get(ids=page_ids, include=["metadatas"])
+        return result, page_ids[-1] if len(ids) > limit else None
+    
+    def _project(self, items: List[Dict[str, Any]], fields: Optional[List[str]]) -> List[Dict[str, Any]]:
+        """Keep only the requested fields (plus id) of each item."""
+        if fields is None:
+            return items
+        keep = set(fields) | {"id"}
+        return [{k: v for k, v in item.items() if k in keep} for item in items]
     
     # ===== TASK OPERATIONS =====
     
-    def create_task(self, title: str, description: str = "", status: str = "pending", 
-                   deadline: Optional[str] = None) -> int:
-        """Create a new task."""
-        task_id = self._next_task_id()
-        doc = f"{title}\n\n{description}\n\nStatus: {status}\nDeadline: {deadline or 'None'}"
+    def _new_task_record(self, title: str, description: str = "", status: str = "pending",
+                         deadline: Optional[str] = None) -> Tuple[str, str, Dict[str, Any]]:
+        """Allocate an id and build the (id, document, metadata) of a new task."""
+        task_id = str(self._next_task_id())
+        doc = self._task_document(title, description, status, deadline)
         metadata = {
-            "id": str(task_id),
+            "id": task_id,
+            # Numeric copy of the id for keyset pagination (see _get_page)
+            "id_num": int(task_id),
             "title": title,
             "description": description or "",
             "status": status,
-            "deadline": deadline or "",
-            "related_notes": "[]"
+            "deadline": deadline or ""
         }
-        self.tasks_col.upsert(ids=[str(task_id)], documents=[doc], metadatas=[metadata])
-        return task_id
+        # Numeric copy of the deadline for range filters (Chroma cannot compare date strings)
+        deadline_ts = to_epoch(deadline)
+        if deadline_ts is not None:
+            metadata["deadline_ts"] = deadline_ts
+        return task_id, doc, metadata
+    
+    def create_task(self, title: str, description: str = "", status: str = "pending", 
+                   deadline: Optional[str] = None) -> int:
+        """Create a new task."""
+        task_id, doc, metadata = self._new_task_record(title, description, status, deadline)
+        self.tasks_col.upsert(ids=[task_id], documents=[doc], metadatas=[metadata],
+                              embeddings=self.embedder.embed([doc]))
+        self.lexical["tasks"].add(task_id, doc)
+        return int(task_id)
+    
+    def _task_from_meta(self, task_id: str, meta: Dict[str, Any]) -> Dict[str, Any]:
+        """Build a task dict from stored metadata (notes are filled in by hydration)."""
+        return {
+            "id": int(task_id),
+            "title": meta.get("title", ""),
+            "description": meta.get("description", ""),
+            "status": meta.get("status", "pending"),
+            "deadline": meta.get("deadline", ""),
+            "notes": []
+        }
+    
+    def _hydrate_task_notes(self, tasks: List[Dict[str, Any]], hydrate: bool = True) -> None:
+        """Fill in each task's notes.
+        
+        Note ids for the whole page come from one relation store query. With
+        hydrate the notes themselves are fetched with a single notes_col.get
+        call; otherwise they are returned as [{"id": ...}].
+        """
+        related = self.relations.notes_for_tasks(task["id"] for task in tasks)
+        if not hydrate:
+            for task in tasks:
+                task["notes"] = [{"id": nid} for nid in related[task["id"]]]
+            return
+        wanted = list(dict.fromkeys(str(nid) for ids in related.values() for nid in ids))
+        notes_by_id = self._get_notes_by_ids(wanted)
+        for task in tasks:
+            task["notes"] = [notes_by_id[str(nid)] for nid in related[task["id"]] if str(nid) in notes_by_id]
     
     def get_task(self, task_id: int) -> Optional[Dict[str, Any]]:
         """Get a task by ID."""
         try:
-            result = self.tasks_col.get(ids=[str(task_id)], include=["documents", "metadatas"])
-            if result["ids"]:
-                meta = result["metadatas"][0]
-                related_notes = json.loads(meta.get("related_notes", "[]"))
-                return {
-                    "id": int(result["ids"][0]),
-                    "title": meta.get("title", ""),
-                    "description": meta.get("description", ""),
-                    "status": meta.get("status", "pending"),
-                    "deadline": meta.get("deadline", ""),
-                    "notes": [self.get_note(int(nid)) for nid in related_notes if self.get_note(int(nid))]
-                }
+            meta = self._get_metadata(self.tasks_col, task_id)
+            if meta:
+                task = self._task_from_meta(str(task_id), meta)
+                self._hydrate_task_notes([task])
+                return task
         except Exception as e:
             print(f"Error getting task {task_id}: {e}")
         return None
     
+    def get_tasks_page(self, limit: Optional[int] = None, cursor: Optional[str] = None,
+                       fields: Optional[List[str]] = None, hydrate: bool = True) -> Dict[str, Any]:
+        """Get one page of tasks ordered by id.
+        
+        Args:
+            limit: Page size (None reads every task)
+            cursor: The next_cursor returned by the previous page
+            fields: Only return these keys (id is always included)
+            hydrate: Fill in full notes; when False notes are returned as [{"id": ...}]
+        
+        Returns:
+            {"items": [...], "next_cursor": str or None}
+        """
+        result, next_cursor = self._get_page(self.tasks_col, limit, cursor)
+        tasks = [
+            self._task_from_meta(task_id, result["metadatas"][i])
+            for i, task_id in enumerate(result["ids"])
+        ]
+        
+        if fields is None or "notes" in fields:
+            self._hydrate_task_notes(tasks, hydrate)
+        
+        tasks = sorted(tasks, key=lambda x: x["id"])
+        return {"items": self._project(tasks, fields), "next_cursor": next_cursor}
+    
     def get_all_tasks(self) -> List[Dict[str, Any]]:
         """Get all tasks."""
         try:
-            result = self.tasks_col.get(include=["metadatas"])
-            tasks = []
-            for i, task_id in enumerate(result["ids"]):
-                meta = result["metadatas"][i]
-                related_notes = json.loads(meta.get("related_notes", "[]"))
-                tasks.append({
-                    "id": int(task_id),
-                    "title": meta.get("title", ""),
-                    "description": meta.get("description", ""),
-                    "status": meta.get("status", "pending"),
-                    "deadline": meta.get("deadline", ""),
-                    "notes": [self.get_note(int(nid)) for nid in related_notes if self.get_note(int(nid))]
-                })
-            return sorted(tasks, key=lambda x: x["id"])
+            return self.get_tasks_page()["items"]
         except Exception as e:
             print(f"Error getting all tasks: {e}")
             return []
     
     def update_task(self, task_id: int, title: Optional[str] = None, description: Optional[str] = None, 
                    status: Optional[str] = None, deadline: Optional[str] = None) -> None:
-        """Update a task. Only updates fields that are provided (not None)."""
-        task = self.get_task(task_id)
-        if not task:
-            return
+        """Update a task. Only updates fields that are provided (not None).
         
+        The task is only re-embedded when its document text actually changes.
+        """
+        record = self._get_record(self.tasks_col, task_id)
+        if not record:
+            return
+        stored_doc, metadata = record
+        doc, metadata = self._updated_task_record(metadata, title, description, status, deadline)
+        self._write_record(self.tasks_col, task_id, doc, metadata, stored_doc)
+    
+    def _updated_task_record(self, metadata: Dict[str, Any], title: Optional[str] = None,
+                             description: Optional[str] = None, status: Optional[str] = None,
+                             deadline: Optional[str] = None) -> Tuple[str, Dict[str, Any]]:
+        """Apply the provided (not None) fields to a task's stored metadata. Returns (document, metadata)."""
         # Use existing values for fields not provided
-        new_title = title if title is not None else task["title"]
-        new_description = description if description is not None else task["description"]
-        new_status = status if status is not None else task["status"]
-        new_deadline = deadline if deadline is not None else task["deadline"]
+        new_title = title if title is not None else metadata.get("title", "")
+        new_description = description if description is not None else metadata.get("description", "")
+        new_status = status if status is not None else metadata.get("status", "pending")
+        new_deadline = deadline if deadline is not None else metadata.get("deadline", "")
         
-        doc = f"{new_title}\n\n{new_description}\n\nStatus: {new_status}\nDeadline: {new_deadline or 'None'}"
-        related_notes = [str(n["id"]) for n in task.get("notes", [])]
-        metadata = {
-            "id": str(task_id),
+        doc = self._task_document(new_title, new_description, new_status, new_deadline)
+        metadata.update({
             "title": new_title,
             "description": new_description or "",
             "status": new_status,
             "deadline": new_deadline or "",
-            "related_notes": json.dumps(related_notes)
-        }
-        self.tasks_col.upsert(ids=[str(task_id)], documents=[doc], metadatas=[metadata])
+            # None removes the key when the deadline is cleared
+            "deadline_ts": to_epoch(new_deadline)
+        })
+        return doc, metadata
     
     def delete_task(self, task_id: int) -> None:
         """Delete a task."""
         try:
             self.tasks_col.delete(ids=[str(task_id)])
+            self.cache.invalidate(("tasks", str(task_id)))
+            self.lexical["tasks"].remove(str(task_id))
+            self.relations.delete_task(task_id)
         except Exception as e:
             print(f"Error deleting task {task_id}: {e}")
     
     # ===== NOTE OPERATIONS =====
     
-    def create_note(self, title: str, content: str = "", created_at: Optional[str] = None) -> int:
-        """Create a new note."""
-        note_id = self._next_note_id()
+    def _new_note_record(self, title: str, content: str = "",
+                         created_at: Optional[str] = None) -> Tuple[str, str, Dict[str, Any]]:
+        """Allocate an id and build the (id, document, metadata) of a new note."""
+        note_id = str(self._next_note_id())
         if not created_at:
             created_at = datetime.now().isoformat()
         
-        doc = f"{title}\n\n{content}"
+        doc = self._note_document(title, content)
         metadata = {
-            "id": str(note_id),
+            "id": note_id,
+            "id_num": int(note_id),
             "title": title,
             "content": content or "",
-            "created_at": created_at,
-            "related_tasks": "[]"
+            "created_at": created_at
         }
-        self.notes_col.upsert(ids=[str(note_id)], documents=[doc], metadatas=[metadata])
-        return note_id
+        created_at_ts = to_epoch(created_at)
+        if created_at_ts is not None:
+            metadata["created_at_ts"] = created_at_ts
+        return note_id, doc, metadata
+    
+    def create_note(self, title: str, content: str = "", created_at: Optional[str] = None) -> int:
+        """Create a new note."""
+        note_id, doc, metadata = self._new_note_record(title, content, created_at)
+        self.notes_col.upsert(ids=[note_id], documents=[doc], metadatas=[metadata],
+                              embeddings=self.embedder.embed([doc]))
+        self.lexical["notes"].add(note_id, doc)
+        return int(note_id)
+    
+    def _note_from_meta(self, note_id: str, meta: Dict[str, Any], task_ids: List[int]) -> Dict[str, Any]:
+        """Build a note dict from stored metadata and its linked task ids."""
+        return {
+            "id": int(note_id),
+            "title": meta.get("title", ""),
+            "content": meta.get("content", ""),
+            "created_at": meta.get("created_at", ""),
+            "tasks": [{"id": tid} for tid in task_ids]
+        }
+    
+    def _get_notes_by_ids(self, note_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Fetch several notes, serving cached ones from memory and the rest in one call.
+        
+        Returns a map of id -> note dict.
+        """
+        metas = {}
+        missing = []
+        for nid in note_ids:
+            meta = self.cache.get(("notes", nid))
+            if meta is None:
+                missing.append(nid)
+            else:
+                metas[nid] = meta
+        if missing:
+            result = self.notes_col.get(ids=missing, include=["metadatas"])
+            for nid, meta in zip(result["ids"], result["metadatas"]):
+                metas[nid] = meta
+                self.cache.put(("notes", nid), meta)
+        related = self.relations.tasks_for_notes(metas)
+        return {nid: self._note_from_meta(nid, meta, related[int(nid)]) for nid, meta in metas.items()}
     
     def get_note(self, note_id: int) -> Optional[Dict[str, Any]]:
         """Get a note by ID."""
         try:
-            result = self.notes_col.get(ids=[str(note_id)], include=["documents", "metadatas"])
-            if result["ids"]:
-                meta = result["metadatas"][0]
-                related_tasks = json.loads(meta.get("related_tasks", "[]"))
-                return {
-                    "id": int(result["ids"][0]),
-                    "title": meta.get("title", ""),
-                    "content": meta.get("content", ""),
-                    "created_at": meta.get("created_at", ""),
-                    "tasks": [{"id": int(tid)} for tid in related_tasks]
-                }
+            return self._get_notes_by_ids([str(note_id)]).get(str(note_id))
         except Exception as e:
             print(f"Error getting note {note_id}: {e}")
         return None
     
+    def get_notes_page(self, limit: Optional[int] = None, cursor: Optional[str] = None,
+                       fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Get one page of notes ordered by id (see get_tasks_page)."""
+        result, next_cursor = self._get_page(self.notes_col, limit, cursor)
+        # Linked task ids for the whole page in one relation store query
+        related = (self.relations.tasks_for_notes(result["ids"]) if fields is None or "tasks" in fields
+                   else {int(note_id): [] for note_id in result["ids"]})
+        notes = [
+            self._note_from_meta(note_id, result["metadatas"][i], related[int(note_id)])
+            for i, note_id in enumerate(result["ids"])
+        ]
+        notes = sorted(notes, key=lambda x: x["id"])
+        return {"items": self._project(notes, fields), "next_cursor": next_cursor}
+    
     def get_all_notes(self) -> List[Dict[str, Any]]:
         """Get all notes."""
         try:
-            result = self.notes_col.get(include=["metadatas"])
-            notes = []
-            for i, note_id in enumerate(result["ids"]):
-                meta = result["metadatas"][i]
-                related_tasks = json.loads(meta.get("related_tasks", "[]"))
-                notes.append({
-                    "id": int(note_id),
-                    "title": meta.get("title", ""),
-                    "content": meta.get("content", ""),
-                    "created_at": meta.get("created_at", ""),
-                    "tasks": [{"id": int(tid)} for tid in related_tasks]
-                })
-            return sorted(notes, key=lambda x: x["id"])
+            return self.get_notes_page()["items"]
         except Exception as e:
             print(f"Error getting all notes: {e}")
             return []
     
     def update_note(self, note_id: int, title: Optional[str] = None, content: Optional[str] = None) -> None:
-        """Update a note. Only updates fields that are provided (not None)."""
-        note = self.get_note(note_id)
-        if not note:
-            return
+        """Update a note. Only updates fields that are provided (not None).
         
+        The note is only re-embedded when its document text actually changes.
+        """
+        record = self._get_record(self.notes_col, note_id)
+        if not record:
+            return
+        stored_doc, metadata = record
+        doc, metadata = self._updated_note_record(metadata, title, content)
+        self._write_record(self.notes_col, note_id, doc, metadata, stored_doc)
+    
+    def _updated_note_record(self, metadata: Dict[str, Any], title: Optional[str] = None,
+                             content: Optional[str] = None) -> Tuple[str, Dict[str, Any]]:
+        """Apply the provided (not None) fields to a note's stored metadata. Returns (document, metadata)."""
         # Use existing values for fields not provided
-        new_title = title if title is not None else note["title"]
-        new_content = content if content is not None else note["content"]
+        new_title = title if title is not None else metadata.get("title", "")
+        new_content = content if content is not None else metadata.get("content", "")
         
-        doc = f"{new_title}\n\n{new_content}"
-        related_tasks = [str(t["id"]) for t in note.get("tasks", [])]
-        metadata = {
-            "id": str(note_id),
+        doc = self._note_document(new_title, new_content)
+        metadata.update({
             "title": new_title,
-            "content": new_content or "",
-            "created_at": note["created_at"],
-            "related_tasks": json.dumps(related_tasks)
-        }
-        self.notes_col.upsert(ids=[str(note_id)], documents=[doc], metadatas=[metadata])
+            "content": new_content or ""
+        })
+        return doc, metadata
     
     def delete_note(self, note_id: int) -> None:
         """Delete a note."""
         try:
             self.notes_col.delete(ids=[str(note_id)])
+            self.cache.invalidate(("notes", str(note_id)))
+            self.lexical["notes"].remove(str(note_id))
+            self.relations.delete_note(note_id)
         except Exception as e:
             print(f"Error deleting note {note_id}: {e}")
     
     # ===== RELATION OPERATIONS =====
     
     def add_note_to_task(self, task_id: int, note_id: int) -> None:
-        """Link a note to a task."""
-        task = self.get_task(task_id)
-        note = self.get_note(note_id)
-        if not task or not note:
-            return
+        """Link a note to a task (one relation store write; Chroma records are untouched).
         
-        # Update task's related_notes
-        related_notes = [str(n["id"]) for n in task.get("notes", [])]
-        if str(note_id) not in related_notes:
-            related_notes.append(str(note_id))
-        
-        doc = f"{task['title']}\n\n{task['description']}\n\nStatus: {task['status']}\nDeadline: {task['deadline'] or 'None'}"
-        metadata = {
-            "id": str(task_id),
-            "title": task["title"],
-            "description": task["description"],
-            "status": task["status"],
-            "deadline": task["deadline"],
-            "related_notes": json.dumps(related_notes)
-        }
-        self.tasks_col.upsert(ids=[str(task_id)], documents=[doc], metadatas=[metadata])
-        
-        # Update note's related_tasks
-        related_tasks = [str(t["id"]) for t in note.get("tasks", [])]
-        if str(task_id) not in related_tasks:
-            related_tasks.append(str(task_id))
-        
-        doc_note = f"{note['title']}\n\n{note['content']}"
-        metadata_note = {
-            "id": str(note_id),
-            "title": note["title"],
-            "content": note["content"],
-            "created_at": note["created_at"],
-            "related_tasks": json.dumps(related_tasks)
-        }
-        self.notes_col.upsert(ids=[str(note_id)], documents=[doc_note], metadatas=[metadata_note])
+        Both records are checked with id-only gets, not the record cache, which
+        can still hold a record another worker has deleted.
+        """
+        if (not self.tasks_col.get(ids=[str(task_id)], include=[])["ids"]
+                or not self.notes_col.get(ids=[str(note_id)], include=[])["ids"]):
+            return
+        self.relations.link(task_id, note_id)
     
     def remove_note_from_task(self, task_id: int, note_id: int) -> None:
         """Unlink a note from a task."""
-        task = self.get_task(task_id)
-        note = self.get_note(note_id)
-        if not task or not note:
+        self.relations.unlink(task_id, note_id)
+    
+    # ===== BULK OPERATIONS =====
+    
+    def _batch_size(self, batch_size: Optional[int]) -> int:
+        """The batch size to use (BULK_BATCH_SIZE when None). Raises ValueError unless it is a positive integer."""
+        if batch_size is None:
+            return BULK_BATCH_SIZE
+        if not valid_batch_size(batch_size):
+            raise ValueError(f"batch_size must be an integer between 1 and {MAX_BATCH_SIZE}")
+        return batch_size
+    
+    def _upsert_batch(self, collection, pending: List[Tuple[Dict[str, Any], str, str, Dict[str, Any]]]) -> None:
+        """Upsert a batch of new records in one call and record the outcome on each result."""
+        if not pending:
             return
+        try:
+            documents = [doc for _, _, doc, _ in pending]
+            collection.upsert(
+                ids=[record_id for _, record_id, _, _ in pending],
+                documents=documents,
+                metadatas=[metadata for _, _, _, metadata in pending],
+                embeddings=self.embedder.embed(documents)
+            )
+            self.lexical[collection.name].add_many({record_id: doc for _, record_id, doc, _ in pending})
+            for result, record_id, _, _ in pending:
+                result["id"] = int(record_id)
+        except Exception as e:
+            print(f"Error upserting batch into {collection.name}: {e}")
+            for result, _, _, _ in pending:
+                result["error"] = str(e)
+    
+    def _create_bulk(self, collection, items: List[Dict[str, Any]], batch_size: Optional[int],
+                     build: Callable[[Dict[str, Any]], Tuple[str, str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """Create records in batches; build(item) allocates an id and returns (id, document, metadata).
         
-        # Update task's related_notes
-        related_notes = [str(n["id"]) for n in task.get("notes", [])]
-        if str(note_id) in related_notes:
-            related_notes.remove(str(note_id))
-        
-        doc = f"{task['title']}\n\n{task['description']}\n\nStatus: {task['status']}\nDeadline: {task['deadline'] or 'None'}"
-        metadata = {
-            "id": str(task_id),
-            "title": task["title"],
-            "description": task["description"],
-            "status": task["status"],
-            "deadline": task["deadline"],
-            "related_notes": json.dumps(related_notes)
-        }
-        self.tasks_col.upsert(ids=[str(task_id)], documents=[doc], metadatas=[metadata])
+        Returns one result per item: {"index", "id"} on success or {"index", "error"}.
+        """
+        batch_size = self._batch_size(batch_size)
+        results = []
+        for start in range(0, len(items), batch_size):
+            pending = []
+            for index, item in enumerate(items[start:start + batch_size], start):
+                result = {"index": index}
+                results.append(result)
+                if not isinstance(item, dict) or not item.get("title"):
+                    result["error"] = "title is required"
+                    continue
+                pending.append((result, *build(item)))
+            self._upsert_batch(collection, pending)
+        return results
+    
+    def _update_bulk(self, collection, items: List[Dict[str, Any]], batch_size: Optional[int],
+                     rebuild: Callable[[Dict[str, Any], Dict[str, Any]], Tuple[str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """Update records in batches; rebuild(metadata, item) returns the new (document, metadata).
         
-        # Update note's related_tasks
-        related_tasks = [str(t["id"]) for t in note.get("tasks", [])]
-        if str(task_id) in related_tasks:
-            related_tasks.remove(str(task_id))
+        Each batch costs one get for the stored records, one metadata-only
+        update for records whose document is unchanged and one upsert (with a
+        single embedding pass) for the rest.
+        Returns one result per item: {"index", "id"} on success or {"index", "error"}.
+        """
+        batch_size = self._batch_size(batch_size)
+        results = []
+        for start in range(0, len(items), batch_size):
+            batch = {}
+            for index, item in enumerate(items[start:start + batch_size], start):
+                result = {"index": index}
+                results.append(result)
+                try:
+                    record_id = str(int(item["id"]))
+                except (TypeError, KeyError, ValueError):
+                    result["error"] = "id is required and must be an integer"
+                    continue
+                if record_id in batch:
+                    result["error"] = "id repeated in the same batch"
+                    continue
+                batch[record_id] = (result, item)
+            if not batch:
+                continue
+            try:
+                stored = collection.get(ids=list(batch), include=["documents", "metadatas"])
+            except Exception as e:
+                print(f"Error reading batch from {collection.name}: {e}")
+                for result, _ in batch.values():
+                    result["error"] = str(e)
+                continue
+            records = {record_id: (doc, dict(meta)) for record_id, doc, meta
+                       in zip(stored["ids"], stored["documents"], stored["metadatas"])}
+            changed, unchanged = [], []
+            for record_id, (result, item) in batch.items():
+                if record_id not in records:
+                    result["error"] = "not found"
+                    continue
+                stored_doc, metadata = records[record_id]
+                doc, metadata = rebuild(metadata, item)
+                (unchanged if doc == stored_doc else changed).append((result, record_id, doc, metadata))
+            if unchanged:
+                try:
+                    collection.update(ids=[record_id for _, record_id, _, _ in unchanged],
+                                      metadatas=[metadata for _, _, _, metadata in unchanged])
+                    for result, record_id, _, _ in unchanged:
+                        result["id"] = int(record_id)
+                except Exception as e:
+                    print(f"Error updating batch in {collection.name}: {e}")
+                    for result, _, _, _ in unchanged:
+                        result["error"] = str(e)
+            self._upsert_batch(collection, changed)
+            for result, record_id, _, metadata in unchanged + changed:
+                if "error" in result:
+                    self.cache.invalidate((collection.name, record_id))
+                else:
+                    self.cache.put((collection.name, record_id), metadata)
+        return results
+    
+    def create_tasks_bulk(self, items: List[Dict[str, Any]], batch_size: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Create many tasks, embedding and upserting them in batches (see _create_bulk)."""
+        return self._create_bulk(self.tasks_col, items, batch_size, lambda item: self._new_task_record(
+            item["title"],
+            item.get("description", ""),
+            item.get("status", "pending"),
+            item.get("deadline")
+        ))
+    
+    def create_notes_bulk(self, items: List[Dict[str, Any]], batch_size: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Create many notes, embedding and upserting them in batches (see _create_bulk)."""
+        return self._create_bulk(self.notes_col, items, batch_size, lambda item: self._new_note_record(
+            item["title"],
+            item.get("content", ""),
+            item.get("created_at")
+        ))
+    
+    def update_tasks_bulk(self, items: List[Dict[str, Any]], batch_size: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Update many tasks; each item is {"id"} plus the fields to change (see _update_bulk)."""
+        return self._update_bulk(self.tasks_col, items, batch_size, lambda metadata, item: self._updated_task_record(
+            metadata,
+            item.get("title"),
+            item.get("description"),
+            item.get("status"),
+            item.get("deadline")
+        ))
+    
+    def update_notes_bulk(self, items: List[Dict[str, Any]], batch_size: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Update many notes; each item is {"id"} plus the fields to change (see _update_bulk)."""
+        return self._update_bulk(self.notes_col, items, batch_size, lambda metadata, item: self._updated_note_record(
+            metadata,
+            item.get("title"),
+            item.get("content")
+        ))
+    
+    def link_bulk(self, links: List[Dict[str, Any]], batch_size: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Add or remove many task-note links.
         
-        doc_note = f"{note['title']}\n\n{note['content']}"
-        metadata_note = {
-            "id": str(note_id),
-            "title": note["title"],
-            "content": note["content"],
-            "created_at": note["created_at"],
-            "related_tasks": json.dumps(related_tasks)
-        }
-        self.notes_col.upsert(ids=[str(note_id)], documents=[doc_note], metadatas=[metadata_note])
+        Each link is {"task_id", "note_id", "action"} where action is "add" (default)
+        or "remove". Every batch costs one id-only get per collection (to check the
+        records exist) and one relation store transaction.
+        Returns one result per link: {"index", "task_id", "note_id", "action"} plus
+        "error" when the link could not be applied.
+        """
+        batch_size = self._batch_size(batch_size)
+        results = []
+        for start in range(0, len(links), batch_size):
+            batch = []
+            for index, link in enumerate(links[start:start + batch_size], start):
+                result = {"index": index}
+                results.append(result)
+                try:
+                    result.update({
+                        "task_id": int(link["task_id"]),
+                        "note_id": int(link["note_id"]),
+                        "action": link.get("action", "add")
+                    })
+                except (TypeError, KeyError, ValueError):
+                    result["error"] = "task_id and note_id are required integers"
+                    continue
+                if result["action"] not in ("add", "remove"):
+                    result["error"] = "action must be 'add' or 'remove'"
+                    continue
+                batch.append(result)
+            self._apply_links(batch)
+        return results
+    
+    def _apply_links(self, batch: List[Dict[str, Any]]) -> None:
+        """Apply one batch of validated link results (see link_bulk)."""
+        if not batch:
+            return
+        try:
+            task_ids = set(self.tasks_col.get(ids=list(dict.fromkeys(str(r["task_id"]) for r in batch)),
+                                              include=[])["ids"])
+            note_ids = set(self.notes_col.get(ids=list(dict.fromkeys(str(r["note_id"]) for r in batch)),
+                                              include=[])["ids"])
+            changes = []
+            for result in batch:
+                if str(result["task_id"]) not in task_ids or str(result["note_id"]) not in note_ids:
+                    result["error"] = "task or note not found"
+                    continue
+                changes.append((result["task_id"], result["note_id"], result["action"] == "add"))
+            self.relations.apply(changes)
+        except Exception as e:
+            print(f"Error applying link batch: {e}")
+            for result in batch:
+                result.setdefault("error", str(e))
     
     # ===== SEARCH OPERATIONS =====
     
-    def search_tasks(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
-        """Semantic search for tasks."""
+    def _query(self, collection, queries: List[str], top_k: int,
+               where: Optional[Dict[str, Any]] = None) -> List[List[Dict[str, Any]]]:
+        """Run several queries against one collection in a single query call.
+        
+        Returns one hit list per query; each hit has id, document, metadata and distance.
+        """
+        result = collection.query(query_embeddings=self.query_embedder.embed_many(queries), n_results=top_k,
+                                  where=where, include=["documents", "metadatas", "distances"])
+        hits = []
+        for q in range(len(queries)):
+            hits.append([
+                {
+                    "id": int(record_id),
+                    "document": result["documents"][q][i],
+                    "metadata": result["metadatas"][q][i],
+                    "distance": result["distances"][q][i]
+                }
+                for i, record_id in enumerate(result["ids"][q])
+            ])
+        return hits
+    
+    def _load_documents(self, collection) -> Dict[str, str]:
+        """All documents of a collection, used to build its lexical index."""
+        result = collection.get(include=["documents"])
+        return {record_id: doc or "" for record_id, doc in zip(result["ids"], result["documents"])}
+    
+    def _lexical_query(self, collection, query: str, top_k: int,
+                       where: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """BM25 keyword search; never embeds anything.
+        
+        The best-scoring ids are read with one get by ids, which also applies
+        `where`. When the filter leaves fewer than top_k hits, more candidates
+        are read (4x each round) until the ranking runs out.
+        Returns hits with id, document, metadata and score (best first).
+        """
+        index = self.lexical[collection.name]
+        index.ensure_built(lambda: self._load_documents(collection))
+        candidates = max(4 * top_k, 50) if where else top_k
+        while True:
+            ranked = index.search(query, candidates)
+            if not ranked:
+                return []
+            result = collection.get(ids=[record_id for record_id, _ in ranked], where=where,
+                                    include=["documents", "metadatas"])
+            rows = {record_id: (doc, meta) for record_id, doc, meta
+                    in zip(result["ids"], result["documents"], result["metadatas"])}
+            hits = [
+                {"id": int(record_id), "document": rows[record_id][0], "metadata": rows[record_id][1], "score": score}
+                for record_id, score in ranked if record_id in rows
+            ][:top_k]
+            if not where or len(hits) >= top_k or len(ranked) < candidates:
+                return hits
+            candidates *= 4
+    
+    def _where(self, conditions: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Combine metadata conditions into one Chroma where clause (None if there are none)."""
+        if not conditions:
+            return None
+        return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+    
+    def _range(self, field: str, after: Optional[str], before: Optional[str]) -> List[Dict[str, Any]]:
+        """Inclusive range conditions on an epoch metadata field."""
+        conditions = []
+        for operator, value in (("$gte", after), ("$lte", before)):
+            if not value:
+                continue
+            seconds = to_epoch(value, end_of_day=operator == "$lte")
+            if seconds is None:
+                raise ValueError(f"Invalid date for {field}: {value}")
+            conditions.append({field: {operator: seconds}})
+        return conditions
+    
+    def _filtered_get(self, collection, top_k: int, where: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Records matching a filter, without a query to rank them."""
+        result = collection.get(where=where, limit=top_k, include=["documents", "metadatas"])
+        return [
+            {"id": int(record_id), "document": doc, "metadata": meta}
+            for record_id, doc, meta in zip(result["ids"], result["documents"], result["metadatas"])
+        ]
+    
+    def _search(self, collection, query: str, top_k: int, mode: str,
+                where: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Search one collection in "semantic", "lexical" or "hybrid" mode.
+        
+        Hybrid runs the vector query (on the executor) and the keyword query
+        side by side, each for HYBRID_CANDIDATES hits, and fuses the two
+        rankings with reciprocal rank fusion. "score" is then the fused score,
+        and "distance" is None for hits found only by keywords.
+        
+        `where` is applied inside Chroma (and to the keyword candidates) before
+        ranking. An empty query just returns up to top_k matching records.
+        """
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode: {mode}")
+        if not query or not query.strip():
+            return self._filtered_get(collection, top_k, where)
+        if mode == "semantic":
+            return self._query(collection, [query], top_k, where)[0]
+        if mode == "lexical":
+            return self._lexical_query(collection, query, top_k, where)
+        candidates = max(top_k, HYBRID_CANDIDATES)
+        # Run in a copy of this context so the query's trace spans join the caller's request
+        vector_future = self.executor.submit(contextvars.copy_context().run, self._query, collection, [query],
+                                             candidates, where)
+        lexical_hits = self._lexical_query(collection, query, candidates, where)
+        vector_hits = vector_future.result()[0]
+        hits = {hit["id"]: {**hit, "distance": None} for hit in lexical_hits}
+        hits.update({hit["id"]: hit for hit in vector_hits})
+        fused = reciprocal_rank_fusion([[hit["id"] for hit in vector_hits], [hit["id"] for hit in lexical_hits]])
+        return [{**hits[record_id], "score": score} for record_id, score in fused[:top_k]]
+    
+    def search_tasks(self, query: str, top_k: int = 5, mode: Optional[str] = None, status: Optional[str] = None,
+                     deadline_before: Optional[str] = None, deadline_after: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Search tasks. mode is "hybrid", "semantic" or "lexical" (default: SEARCH_MODE).
+        
+        status and the (inclusive) deadline bounds are pushed down into Chroma as a where clause.
+        """
         try:
-            result = self.tasks_col.query(query_texts=[query], n_results=top_k, 
-                                         include=["documents", "metadatas"])
-            tasks = []
-            for i in range(len(result["ids"][0])):
-                meta = result["metadatas"][0][i]
-                tasks.append({
-                    "id": int(result["ids"][0][i]),
-                    "document": result["documents"][0][i],
-                    "metadata": meta
-                })
-            return tasks
+            conditions = [{"status": status}] if status else []
+            conditions += self._range("deadline_ts", deadline_after, deadline_before)
+            return self._search(self.tasks_col, query, top_k, mode or SEARCH_MODE, self._where(conditions))
         except Exception as e:
             print(f"Error searching tasks: {e}")
             return []
     
-    def search_notes(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
-        """Semantic search for notes."""
+    def search_notes(self, query: str, top_k: int = 5, mode: Optional[str] = None,
+                     created_after: Optional[str] = None, created_before: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Search notes. mode is "hybrid", "semantic" or "lexical" (default: SEARCH_MODE).
+        
+        The (inclusive) created_at bounds are pushed down into Chroma as a where clause.
+        """
         try:
-            result = self.notes_col.query(query_texts=[query], n_results=top_k,
-                                         include=["documents", "metadatas"])
-            notes = []
-            for i in range(len(result["ids"][0])):
-                meta = result["metadatas"][0][i]
-                notes.append({
-                    "id": int(result["ids"][0][i]),
-                    "document": result["documents"][0][i],
-                    "metadata": meta
-                })
-            return notes
+            conditions = self._range("created_at_ts", created_after, created_before)
+            return self._search(self.notes_col, query, top_k, mode or SEARCH_MODE, self._where(conditions))
         except Exception as e:
             print(f"Error searching notes: {e}")
             return []
+    
+    def search_context(self, queries: List[str], top_k: int = 5) -> List[Dict[str, Any]]:
+        """Search notes and tasks for several queries at once.
+        
+        Both collections are queried concurrently, each with one batched query
+        call. Hits are merged, deduplicated per (source, id) keeping the best
+        distance, and sorted by distance. Each hit also has a "source" key
+        ("note" or "task").
+        """
+        try:
+            # Embed up front so both collection queries reuse the cached vectors
+            self.query_embedder.embed_many(queries)
+            futures = {
+                source: self.executor.submit(contextvars.copy_context().run, self._query, collection, queries, top_k)
+                for source, collection in (("note", self.notes_col), ("task", self.tasks_col))
+            }
+            best = {}
+            for source, future in futures.items():
+                for hits in future.result():
+                    for hit in hits:
+                        key = (source, hit["id"])
+                        if key not in best or hit["distance"] < best[key]["distance"]:
+                            best[key] = {"source": source, **hit}
+            return sorted(best.values(), key=lambda h: h["distance"])
+        except Exception as e:
+            print(f"Error searching context: {e}")
+            return []
 
 
 # Global instance
 _chroma_manager = None
+_chroma_manager_lock = threading.Lock()
 
 
 def get_chroma_manager() -> ChromaManager:
     """Get or create the global ChromaManager instance."""
     global _chroma_manager
     if _chroma_manager is None:
-        _chroma_manager = ChromaManager()
+        with _chroma_manager_lock:
+            if _chroma_manager is None:
+                _chroma_manager = ChromaManager()
     return _chroma_manager
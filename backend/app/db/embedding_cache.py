@@ -0,0 +1,161 @@
+"""Persistent embedding cache for ChromaManager.
+
+Vectors are stored in a SQLite file next to the Chroma data, keyed by the
+embedding model id and the SHA-256 of the text, so re-seeding, re-importing
+or rewriting a document with text that was embedded before is a lookup
+instead of a model call. Vectors are stored as float32 blobs.
+
+Entries are capped by count. When the cap is exceeded the least recently
+used entries are evicted, down to 90% of the cap. Hits do not write on every
+lookup: their last_used times are buffered and written in one transaction
+every EMBEDDING_CACHE_TOUCH_INTERVAL seconds (or 500 entries, or before an
+eviction), so reads rarely take the SQLite write lock.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Any, Dict, List
+
+EMBEDDING_CACHE_FILE = "embedding_cache.sqlite3"
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE", "1") == "1"
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "100000"))
+EMBEDDING_CACHE_TOUCH_INTERVAL = float(os.getenv("EMBEDDING_CACHE_TOUCH_INTERVAL", "60"))
+# Buffered last_used updates that force a write
+_TOUCH_BATCH = 500
+
+
+def text_hash(text: str) -> str:
+    """SHA-256 of a text, used as part of the cache key."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """(model id, text hash) -> vector, persisted in SQLite with LRU eviction."""
+
+    def __init__(self, persist_dir: str, model_id: str, max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES,
+                 touch_interval: float = EMBEDDING_CACHE_TOUCH_INTERVAL):
+        os.makedirs(persist_dir, exist_ok=True)
+        self.path = os.path.join(persist_dir, EMBEDDING_CACHE_FILE)
+        self.model_id = model_id
+        self.max_entries = max_entries
+        self.touch_interval = touch_interval
+        self._touched: Dict[str, float] = {}  # hash -> last_used not yet written
+        self._touched_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "model TEXT NOT NULL, hash TEXT NOT NULL, vector BLOB NOT NULL, last_used REAL NOT NULL, "
+                "PRIMARY KEY (model, hash))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+            self._size = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def _connection(self) -> sqlite3.Connection:
+        """Get this process's connection (reopened after a fork). Call with the lock held."""
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._pid = os.getpid()
+        return self._conn
+
+    def get_many(self, texts: List[str]) -> Dict[str, List[float]]:
+        """Cached vectors for the given texts, as {text: vector}. Missing texts are left out."""
+        hashes = {text_hash(text): text for text in texts}
+        found: Dict[str, List[float]] = {}
+        with self._lock:
+            conn = self._connection()
+            keys = list(hashes)
+            # Stay under SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN ({placeholders})",
+                    [self.model_id, *chunk]
+                ).fetchall()
+                now = time.time()
+                for digest, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[hashes[digest]] = vector.tolist()
+                    self._touched[digest] = now
+            if len(self._touched) >= _TOUCH_BATCH or time.monotonic() - self._touched_at >= self.touch_interval:
+                self._flush_touches(conn)
+            self.hits += len(found)
+            self.misses += len(set(texts)) - len(found)
+        return found
+
+    def put_many(self, texts: List[str], vectors: List[List[float]]) -> None:
+        """Store vectors for texts, evicting the least recently used entries over the cap."""
+        if not texts:
+            return
+        now = time.time()
+        rows = [(self.model_id, text_hash(text), array("f", vector).tobytes(), now)
+                for text, vector in zip(texts, vectors)]
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                before = conn.total_changes
+                conn.executemany("INSERT OR IGNORE INTO embeddings (model, hash, vector, last_used) VALUES (?, ?, ?, ?)", rows)
+                self._size += conn.total_changes - before
+                if self._size > self.max_entries:
+                    self._evict(conn)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _flush_touches(self, conn: sqlite3.Connection) -> None:
+        """Write the buffered last_used times in one transaction. Call with the lock held."""
+        self._touched_at = time.monotonic()
+        if not self._touched:
+            return
+        touched, self._touched = self._touched, {}
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._write_touches(conn, touched)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    
+    def _write_touches(self, conn: sqlite3.Connection, touched: Dict[str, float]) -> None:
+        """Set last_used for {hash: time}. Call inside a transaction."""
+        conn.executemany("UPDATE embeddings SET last_used = ? WHERE model = ? AND hash = ?",
+                         [(last_used, self.model_id, digest) for digest, last_used in touched.items()])
+    
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """Drop the least recently used entries down to 90% of the cap. Call inside a transaction."""
+        # Write buffered hits first so recently used entries are not evicted
+        touched, self._touched = self._touched, {}
+        self._write_touches(conn, touched)
+        # Other processes may have added entries too; recount before evicting
+        self._size = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        excess = self._size - int(self.max_entries * 0.9)
+        if excess <= 0:
+            return
+        conn.execute(
+            "DELETE FROM embeddings WHERE rowid IN (SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+            (excess,)
+        )
+        self._size -= excess
+        self.evictions += excess
+
+    def stats(self) -> Dict[str, Any]:
+        """Size, cap and hit/miss/eviction counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"size": self._size, "max_entries": self.max_entries, "model": self.model_id,
+                    "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0}
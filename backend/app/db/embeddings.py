@@ -0,0 +1,281 @@
+"""Embedding helpers for ChromaManager.
+
+ChromaManager computes all vectors itself through an EmbeddingService and
+hands them to Chroma (embeddings= / query_embeddings=), so concurrent writes
+and searches are embedded in shared batches. Search queries are also cached
+so one vector can be reused across collections and repeated searches.
+"""
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+from app.utils import tracing
+from app.utils.metrics import EMBEDDING_BATCH_SECONDS, EMBEDDING_TEXTS
+
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "1024"))
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+EMBED_MAX_WAIT_MS = float(os.getenv("EMBED_MAX_WAIT_MS", "2"))
+# Each ONNX inference already uses every core, so more batches in parallel only
+# oversubscribe the CPU; raise it for models or hosts where that is not the case
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "1"))
+# "thread": batches share the model in this process; "process": one model per worker process
+EMBED_EXECUTOR = os.getenv("EMBED_EXECUTOR", "thread")
+
+
+def embedding_model_id(embedding_function) -> str:
+    """Identifier of the model behind an embedding function, used to key cached vectors.
+    
+    Pass the concrete model (e.g. "onnx_mini_lm_l6_v2:all-MiniLM-L6-v2"), not a
+    wrapper such as DefaultEmbeddingFunction whose id ("default") would stay
+    the same if the model behind it changed.
+    """
+    try:
+        name = embedding_function.name()
+    except Exception:
+        name = type(embedding_function).__name__
+    model = getattr(embedding_function, "MODEL_NAME", None) or getattr(embedding_function, "model_name", None)
+    return f"{name}:{model}" if model else str(name)
+
+
+def default_embedding_function():
+    """The embedding function Chroma uses when a collection has none configured.
+    
+    Only used as the collections' configured function: it builds a new model
+    wrapper on every call, so vectors are computed with default_model().
+    """
+    from chromadb.utils import embedding_functions
+    return embedding_functions.DefaultEmbeddingFunction()
+
+
+def default_model():
+    """The model behind default_embedding_function(), as one reusable instance.
+    
+    The ONNX session and tokenizer are loaded on the first call, not here,
+    and then kept for every later call.
+    """
+    from chromadb.utils.embedding_functions.onnx_mini_lm_l6_v2 import ONNXMiniLM_L6_V2
+    return ONNXMiniLM_L6_V2()
+
+
+# Model of an EMBED_EXECUTOR=process worker
+_worker_function = None
+
+
+def _init_worker():
+    global _worker_function
+    _worker_function = default_model()
+
+
+def _embed_in_worker(texts: List[str]) -> List[List[float]]:
+    return [[float(x) for x in vector] for vector in _worker_function(texts)]
+
+
+class EmbeddingService:
+    """Embeds texts in micro-batches on a pool of workers.
+    
+    Callers block in embed() while a dispatcher thread groups concurrent
+    requests into batches of up to max_batch_size texts, waiting at most
+    max_wait_ms for more to arrive. Up to `workers` batches run at once: on
+    threads sharing the model (the ONNX runtime releases the GIL), or with
+    executor="process" on worker processes that each load the default model.
+    Large requests are split into several batches so they use every worker.
+    
+    With a persistent `cache` (EmbeddingCache), texts embedded before are
+    read from disk and only new texts reach the model. Search queries skip
+    it (use_cache=False): they have their own in-memory cache (QueryEmbedder)
+    and would otherwise fill the disk cache with one-off texts.
+    """
+    
+    def __init__(self, embedding_function, max_batch_size: int = EMBED_BATCH_SIZE,
+                 max_wait_ms: float = EMBED_MAX_WAIT_MS, workers: int = EMBED_WORKERS,
+                 executor: str = EMBED_EXECUTOR, cache=None):
+        self.embedding_function = embedding_function
+        self.cache = cache
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.workers = max(1, workers)
+        self.executor = executor
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.texts = 0
+    
+    def __call__(self, input: List[str]) -> List[List[float]]:
+        """Same call shape as a Chroma embedding function."""
+        return self.embed(list(input))
+    
+    def embed(self, texts: List[str], use_cache: bool = True) -> List[List[float]]:
+        """Embed texts, sharing batches with concurrent callers. Blocks until done.
+        
+        With use_cache=False the persistent cache is neither read nor written.
+        """
+        if not texts:
+            return []
+        with tracing.span("embedding.embed", texts=len(texts)) as span:
+            if self.cache is None or not use_cache:
+                return self._embed_uncached(texts)
+            vectors = self.cache.get_many(texts)
+            missing = [text for text in dict.fromkeys(texts) if text not in vectors]
+            if span is not None:
+                span.set_attribute("cache_misses", len(missing))
+            if missing:
+                computed = self._embed_uncached(missing)
+                self.cache.put_many(missing, computed)
+                vectors.update(zip(missing, computed))
+            return [vectors[text] for text in texts]
+    
+    def _embed_uncached(self, texts: List[str]) -> List[List[float]]:
+        """Queue texts for the model in chunks of at most max_batch_size and wait for the vectors."""
+        self._ensure_started()
+        futures = []
+        for start in range(0, len(texts), self.max_batch_size):
+            future = Future()
+            self._queue.put((texts[start:start + self.max_batch_size], future))
+            futures.append(future)
+        return [vector for future in futures for vector in future.result()]
+    
+    def stats(self) -> Dict[str, Any]:
+        """Batch counters and the number of requests waiting for a batch."""
+        with self._stats_lock:
+            return {"batches": self.batches, "texts": self.texts,
+                    "avg_batch_size": round(self.texts / self.batches, 2) if self.batches else 0.0,
+                    "queue_depth": self._queue.qsize() if self._pid else 0,
+                    "workers": self.workers, "executor": self.executor}
+    
+    def _ensure_started(self) -> None:
+        """Start the pool and dispatcher on first use (again in a forked child)."""
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            if self.executor == "process":
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="embedding")
+            self._queue: "queue.Queue[Tuple[List[str], Future]]" = queue.Queue()
+            self._slots = threading.Semaphore(self.workers)
+            threading.Thread(target=self._dispatch, args=(self._queue,),
+                             name="embedding-dispatcher", daemon=True).start()
+            self._pid = os.getpid()
+    
+    def _dispatch(self, requests: "queue.Queue[Tuple[List[str], Future]]") -> None:
+        """Collect requests into batches and hand them to the pool.
+        
+        A batch is only collected once a worker is free, so requests that
+        arrive while all workers are busy end up in the next, larger batch.
+        """
+        carry = None
+        while True:
+            self._slots.acquire()
+            batch = [carry or requests.get()]
+            carry = None
+            size = len(batch[0][0])
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_batch_size:
+                try:
+                    item = requests.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if size + len(item[0]) > self.max_batch_size:
+                    carry = item
+                    break
+                batch.append(item)
+                size += len(item[0])
+            
+            texts = [text for item_texts, _ in batch for text in item_texts]
+            started = time.perf_counter()
+            try:
+                if self.executor == "process":
+                    result = self._pool.submit(_embed_in_worker, texts)
+                else:
+                    result = self._pool.submit(self._embed_batch, texts)
+                result.add_done_callback(lambda done, batch=batch, started=started: self._deliver(batch, done, started))
+            except Exception as e:
+                self._slots.release()
+                for _, future in batch:
+                    future.set_exception(e)
+    
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        return [[float(x) for x in vector] for vector in self.embedding_function(texts)]
+    
+    def _deliver(self, batch: List[Tuple[List[str], Future]], done: Future, started: float) -> None:
+        """Split a finished batch back into the callers' results."""
+        self._slots.release()
+        error = done.exception()
+        if error is None:
+            size = sum(len(texts) for texts, _ in batch)
+            EMBEDDING_BATCH_SECONDS.observe(time.perf_counter() - started)
+            EMBEDDING_TEXTS.inc(size)
+            with self._stats_lock:
+                self.batches += 1
+                self.texts += size
+        offset = 0
+        for texts, future in batch:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(done.result()[offset:offset + len(texts)])
+            offset += len(texts)
+
+
+def normalize_query(text: str) -> str:
+    """Normalize a query for caching: trim and collapse whitespace."""
+    return " ".join(text.split())
+
+
+class QueryEmbedder:
+    """Embeds query strings with a bounded, thread-safe LRU cache of vectors."""
+    
+    def __init__(self, embedding_function, max_size: int = QUERY_CACHE_SIZE):
+        self.embedding_function = embedding_function
+        self.max_size = max_size
+        self._vectors: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def embed(self, query: str) -> List[float]:
+        """Get the embedding of a query, computing it at most once per distinct text."""
+        return self.embed_many([query])[0]
+    
+    def embed_many(self, queries: List[str]) -> List[List[float]]:
+        """Get the embeddings of several queries, embedding all cache misses in one call."""
+        keys = [normalize_query(q) for q in queries]
+        vectors: Dict[str, List[float]] = {}
+        with self._lock:
+            for key in keys:
+                vector = self._vectors.get(key)
+                if vector is not None:
+                    self._vectors.move_to_end(key)
+                    self.hits += 1
+                    vectors[key] = vector
+            missing = [key for key in dict.fromkeys(keys) if key not in vectors]
+            self.misses += len(missing)
+        
+        if missing:
+            # Embed outside the lock so concurrent searches are not serialized
+            computed = self.embedding_function(missing)
+            for key, vector in zip(missing, computed):
+                vectors[key] = [float(x) for x in vector]
+            if self.max_size > 0:
+                with self._lock:
+                    for key in missing:
+                        self._vectors[key] = vectors[key]
+                        self._vectors.move_to_end(key)
+                    while len(self._vectors) > self.max_size:
+                        self._vectors.popitem(last=False)
+        return [vectors[key] for key in keys]
+    
+    def stats(self) -> Dict[str, Any]:
+        """Current size and counters."""
+        with self._lock:
+            return {"size": len(self._vectors), "max_size": self.max_size,
+                    "hits": self.hits, "misses": self.misses}
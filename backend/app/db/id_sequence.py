@@ -0,0 +1,138 @@
+"""Persistent id sequences for ChromaManager.
+
+Chroma has no auto-increment, so the last id handed out for each collection
+is kept in a small SQLite file next to the Chroma data. Reading or bumping a
+sequence is a single-row operation, so startup does not depend on how many
+records are stored.
+
+Reservations run in a `BEGIN IMMEDIATE` transaction, which takes SQLite's
+write lock on the file, so threads and worker processes sharing the same
+persist directory never get the same id. IdAllocator reserves ids in blocks
+so most creates are served from memory without touching the file.
+
+The same file records which one-time data migrations have run (a separate
+`migrations` table), so the sequences table only holds id counters.
+"""
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+SEQUENCE_FILE = "id_sequences.sqlite3"
+ID_BLOCK_SIZE = int(os.getenv("ID_BLOCK_SIZE", "32"))
+# Migrations that used to be marked done with a placeholder sequence row
+_LEGACY_MIGRATION_ROWS = ("epoch_metadata", "id_metadata", "relations")
+
+
+class IdSequence:
+    """Named integer counters persisted in SQLite."""
+    
+    def __init__(self, persist_dir: str):
+        os.makedirs(persist_dir, exist_ok=True)
+        self.path = os.path.join(persist_dir, SEQUENCE_FILE)
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        with self._lock:
+            conn = self._connection()
+            conn.execute("CREATE TABLE IF NOT EXISTS sequences (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS migrations (name TEXT PRIMARY KEY, done_at REAL NOT NULL)")
+            self._move_legacy_rows(conn)
+    
+    def _connection(self) -> sqlite3.Connection:
+        """Get this process's connection (reopened after a fork). Call with the lock held."""
+        if self._conn is None or self._pid != os.getpid():
+            # Autocommit mode; writes use explicit transactions
+            self._conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            self._pid = os.getpid()
+        return self._conn
+    
+    def _move_legacy_rows(self, conn: sqlite3.Connection) -> None:
+        """Turn placeholder sequence rows of finished migrations into migrations rows. Call with the lock held."""
+        placeholders = ",".join("?" * len(_LEGACY_MIGRATION_ROWS))
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                f"INSERT OR IGNORE INTO migrations (name, done_at) "
+                f"SELECT name, ? FROM sequences WHERE name IN ({placeholders})",
+                (time.time(), *_LEGACY_MIGRATION_ROWS)
+            )
+            conn.execute(f"DELETE FROM sequences WHERE name IN ({placeholders})", _LEGACY_MIGRATION_ROWS)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    
+    def get(self, name: str) -> Optional[int]:
+        """Get the last id handed out for a sequence, or None if it does not exist yet."""
+        with self._lock:
+            row = self._connection().execute("SELECT value FROM sequences WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+    
+    def ensure(self, name: str, start: int) -> None:
+        """Create a sequence starting at `start` (the last used id) unless it already exists."""
+        with self._lock:
+            self._connection().execute("INSERT OR IGNORE INTO sequences (name, value) VALUES (?, ?)", (name, start))
+    
+    def reserve(self, name: str, count: int) -> Tuple[int, int]:
+        """Atomically reserve `count` ids. Returns the (first, last) ids of the block."""
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("UPDATE sequences SET value = value + ? WHERE name = ?", (count, name))
+                last = conn.execute("SELECT value FROM sequences WHERE name = ?", (name,)).fetchone()[0]
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return last - count + 1, last
+    
+    def next(self, name: str) -> int:
+        """Atomically increment a sequence and return the new value."""
+        return self.reserve(name, 1)[0]
+    
+    def is_done(self, migration: str) -> bool:
+        """Whether a one-time migration has already run on this persist directory."""
+        with self._lock:
+            row = self._connection().execute("SELECT 1 FROM migrations WHERE name = ?", (migration,)).fetchone()
+        return row is not None
+    
+    def mark_done(self, migration: str) -> None:
+        """Record that a one-time migration has run."""
+        with self._lock:
+            self._connection().execute("INSERT OR IGNORE INTO migrations (name, done_at) VALUES (?, ?)",
+                                       (migration, time.time()))
+
+
+class IdAllocator:
+    """Hands out ids from per-process blocks reserved in an IdSequence.
+    
+    Each process reserves `block_size` ids at a time and serves them under a
+    thread lock, so concurrent creates only meet at the file once per block.
+    Ids stay unique across workers but are only increasing within a process,
+    and the unused part of a block is skipped when the process exits.
+    """
+    
+    def __init__(self, sequences: IdSequence, block_size: int = ID_BLOCK_SIZE):
+        self.sequences = sequences
+        self.block_size = max(1, block_size)
+        self._lock = threading.Lock()
+        self._blocks: Dict[str, List[int]] = {}  # name -> [next id, last id]
+        self._pid = os.getpid()
+    
+    def next(self, name: str) -> int:
+        """Get the next free id for a sequence."""
+        with self._lock:
+            if self._pid != os.getpid():
+                # Forked worker: blocks reserved by the parent belong to the parent
+                self._blocks = {}
+                self._pid = os.getpid()
+            block = self._blocks.get(name)
+            if block is None or block[0] > block[1]:
+                first, last = self.sequences.reserve(name, self.block_size)
+                block = self._blocks[name] = [first, last]
+            value = block[0]
+            block[0] += 1
+            return value
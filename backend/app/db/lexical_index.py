@@ -0,0 +1,168 @@
+"""In-process BM25 index for keyword search in ChromaManager.
+
+Vector search ranks exact tokens (course codes, ticket numbers, command
+names) poorly, so each collection also gets an inverted index over its
+documents (title, description/content). Lexical queries never touch the
+embedding model. Hybrid search fuses the lexical and vector rankings with
+reciprocal rank fusion.
+
+The index is built from the collection on first use and then kept up to
+date by ChromaManager writes. Writes made by other worker processes are
+picked up by a rebuild once the index is older than LEXICAL_INDEX_MAX_AGE
+seconds (0 disables it). A rebuild reads the collection on a background
+thread while searches keep using the current index, and writes made in the
+meantime are replayed onto the new index before it is swapped in.
+"""
+import heapq
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+LEXICAL_INDEX_MAX_AGE = float(os.getenv("LEXICAL_INDEX_MAX_AGE", "300"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+_TOKEN_RE = re.compile(r"[^\W_]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased runs of letters and digits."""
+    return _TOKEN_RE.findall((text or "").lower())
+
+
+def reciprocal_rank_fusion(rankings: List[List[Hashable]], k: int = RRF_K) -> List[Tuple[Hashable, float]]:
+    """Fuse several ranked id lists into one, scoring each id by sum(1 / (k + rank))."""
+    scores: Dict[Hashable, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, record_id in enumerate(ranking, start=1):
+            scores[record_id] += 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class LexicalIndex:
+    """Thread-safe BM25 inverted index of id -> document text."""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75, max_age: float = LEXICAL_INDEX_MAX_AGE):
+        self.k1 = k1
+        self.b = b
+        self.max_age = max_age
+        self._postings: Dict[str, Dict[str, int]] = defaultdict(dict)  # term -> {id: term frequency}
+        self._terms: Dict[str, List[str]] = {}  # id -> distinct terms, for removal
+        self._lengths: Dict[str, int] = {}
+        self._total_length = 0
+        self._built_at = None
+        self._lock = threading.Lock()
+        # Serializes builds; while one runs, writes are also logged in _pending
+        self._build_lock = threading.Lock()
+        self._pending: Optional[List[Tuple[str, Optional[str]]]] = None  # (id, text or None for removal)
+
+    def ensure_built(self, load: Callable[[], Dict[str, str]]) -> None:
+        """Build the index from load() -> {id: document} if it is missing; rebuild it in the background if too old.
+
+        The first build runs on the calling thread (searches need an index);
+        later rebuilds never block searches or writes.
+        """
+        with self._lock:
+            built_at = self._built_at
+        if built_at is None:
+            with self._build_lock:
+                if self._built_at is None:
+                    self._rebuild(load)
+        elif self.max_age and time.monotonic() - built_at >= self.max_age and self._build_lock.acquire(blocking=False):
+            def rebuild():
+                try:
+                    self._rebuild(load)
+                except Exception as e:
+                    print(f"Error rebuilding lexical index: {e}")
+                finally:
+                    self._build_lock.release()
+            threading.Thread(target=rebuild, name="lexical-index-rebuild", daemon=True).start()
+
+    def _rebuild(self, load: Callable[[], Dict[str, str]]) -> None:
+        """Load every document into a new index and swap it in. Call with _build_lock held."""
+        with self._lock:
+            self._pending = []
+        try:
+            fresh = LexicalIndex(self.k1, self.b, self.max_age)
+            for record_id, text in load().items():
+                fresh._add(record_id, text)
+        except Exception:
+            with self._lock:
+                self._pending = None
+            raise
+        with self._lock:
+            self._postings, self._terms = fresh._postings, fresh._terms
+            self._lengths, self._total_length = fresh._lengths, fresh._total_length
+            # Writes made while loading may be missing from the snapshot
+            for record_id, text in self._pending:
+                if text is None:
+                    self._remove(record_id)
+                else:
+                    self._add(record_id, text)
+            self._pending = None
+            self._built_at = time.monotonic()
+
+    def add(self, record_id: str, text: str) -> None:
+        """Index (or re-index) one document. A no-op until the index is built."""
+        self.add_many({record_id: text})
+
+    def add_many(self, documents: Dict[str, str]) -> None:
+        """Index (or re-index) several documents. A no-op until the index is built."""
+        with self._lock:
+            if self._pending is not None:
+                self._pending.extend(documents.items())
+            if self._built_at is None:
+                return
+            for record_id, text in documents.items():
+                self._add(record_id, text)
+
+    def remove(self, record_id: str) -> None:
+        """Drop a document from the index."""
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((record_id, None))
+            self._remove(record_id)
+
+    def _add(self, record_id: str, text: str) -> None:
+        self._remove(record_id)
+        counts = Counter(tokenize(text))
+        for term, count in counts.items():
+            self._postings[term][record_id] = count
+        self._terms[record_id] = list(counts)
+        self._lengths[record_id] = sum(counts.values())
+        self._total_length += self._lengths[record_id]
+
+    def _remove(self, record_id: str) -> None:
+        for term in self._terms.pop(record_id, []):
+            posting = self._postings.get(term)
+            if posting is not None:
+                posting.pop(record_id, None)
+                if not posting:
+                    del self._postings[term]
+        self._total_length -= self._lengths.pop(record_id, 0)
+
+    def search(self, query: str, top_k: int) -> List[Tuple[str, float]]:
+        """Top documents for a query as (id, BM25 score), best first."""
+        with self._lock:
+            count = len(self._lengths)
+            if not count:
+                return []
+            avg_length = self._total_length / count or 1.0
+            scores: Dict[str, float] = defaultdict(float)
+            for term in set(tokenize(query)):
+                posting = self._postings.get(term)
+                if not posting:
+                    continue
+                idf = math.log(1 + (count - len(posting) + 0.5) / (len(posting) + 0.5))
+                for record_id, tf in posting.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[record_id] / avg_length)
+                    scores[record_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+
+    def stats(self) -> Dict[str, int]:
+        """Number of indexed documents and distinct terms."""
+        with self._lock:
+            return {"documents": len(self._lengths), "terms": len(self._postings)}
@@ -0,0 +1,77 @@
+"""In-process read-through cache for ChromaManager records.
+
+Keys are (collection name, id) and values are the stored metadata dicts.
+Entries are bounded by count (LRU) and by age (TTL). Writes made through
+this process update the cache, but writes made by another worker process
+are only seen once the entry expires, so the TTL is the staleness bound
+across workers. It defaults to a few seconds; set RECORD_CACHE_TTL=0 to
+turn the cache off, or raise it when a single worker serves the API.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+RECORD_CACHE_SIZE = int(os.getenv("RECORD_CACHE_SIZE", "2048"))
+RECORD_CACHE_TTL = float(os.getenv("RECORD_CACHE_TTL", "5"))
+
+
+class RecordCache:
+    """Thread-safe LRU cache with a TTL and hit/miss/eviction counters."""
+    
+    def __init__(self, max_size: int = RECORD_CACHE_SIZE, ttl: float = RECORD_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, key: Hashable) -> Optional[Dict[str, Any]]:
+        """Get a copy of a cached value, or None on a miss."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                    self.evictions += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return dict(entry[1])
+    
+    def put(self, key: Hashable, value: Dict[str, Any]) -> None:
+        """Store a copy of a value, evicting the least recently used entries if full."""
+        if self.max_size <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, dict(value))
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+    
+    def invalidate(self, key: Hashable) -> None:
+        """Drop one entry if present."""
+        with self._lock:
+            self._data.pop(key, None)
+    
+    def clear(self) -> None:
+        """Drop every entry (counters are kept)."""
+        with self._lock:
+            self._data.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Current size and counters."""
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
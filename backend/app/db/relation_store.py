@@ -0,0 +1,108 @@
+"""Task-note links for ChromaManager.
+
+Links used to be JSON id lists in the metadata of both records, so every
+link change rewrote two Chroma records and deletes left dangling ids. They
+now live in one SQLite table next to the Chroma data, indexed on both
+columns: linking or unlinking is a single-row write, deleting a record drops
+its links, and the neighbours of a whole page are read with one query.
+
+Neighbours are returned in the order they were linked.
+"""
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Tuple
+
+RELATION_FILE = "relations.sqlite3"
+# Stay under SQLite's bound-parameter limit
+_CHUNK = 500
+
+
+class RelationStore:
+    """Many-to-many task-note links persisted in SQLite."""
+
+    def __init__(self, persist_dir: str):
+        os.makedirs(persist_dir, exist_ok=True)
+        self.path = os.path.join(persist_dir, RELATION_FILE)
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS task_notes ("
+                "task_id INTEGER NOT NULL, note_id INTEGER NOT NULL, PRIMARY KEY (task_id, note_id))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS task_notes_note ON task_notes (note_id)")
+
+    def _connection(self) -> sqlite3.Connection:
+        """Get this process's connection (reopened after a fork). Call with the lock held."""
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._pid = os.getpid()
+        return self._conn
+
+    def link(self, task_id: int, note_id: int) -> bool:
+        """Link a note to a task. Returns False if they were already linked."""
+        return self.apply([(task_id, note_id, True)])[0]
+
+    def unlink(self, task_id: int, note_id: int) -> bool:
+        """Unlink a note from a task. Returns False if they were not linked."""
+        return self.apply([(task_id, note_id, False)])[0]
+
+    def apply(self, changes: List[Tuple[int, int, bool]]) -> List[bool]:
+        """Apply (task_id, note_id, linked) changes in one transaction. Returns whether each one changed a link."""
+        changed = []
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for task_id, note_id, linked in changes:
+                    if linked:
+                        cursor = conn.execute("INSERT OR IGNORE INTO task_notes (task_id, note_id) VALUES (?, ?)",
+                                              (int(task_id), int(note_id)))
+                    else:
+                        cursor = conn.execute("DELETE FROM task_notes WHERE task_id = ? AND note_id = ?",
+                                              (int(task_id), int(note_id)))
+                    changed.append(cursor.rowcount > 0)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return changed
+
+    def _neighbours(self, column: str, other: str, ids: Iterable[int]) -> Dict[int, List[int]]:
+        """{id: [linked ids]} for every id, looked up with one query per chunk of ids."""
+        ids = list(dict.fromkeys(int(i) for i in ids))
+        found: Dict[int, List[int]] = {i: [] for i in ids}
+        with self._lock:
+            conn = self._connection()
+            for start in range(0, len(ids), _CHUNK):
+                chunk = ids[start:start + _CHUNK]
+                rows = conn.execute(
+                    f"SELECT {column}, {other} FROM task_notes WHERE {column} IN ({','.join('?' * len(chunk))}) "
+                    "ORDER BY rowid",
+                    chunk
+                ).fetchall()
+                for record_id, other_id in rows:
+                    found[record_id].append(other_id)
+        return found
+
+    def notes_for_tasks(self, task_ids: Iterable[int]) -> Dict[int, List[int]]:
+        """Linked note ids per task."""
+        return self._neighbours("task_id", "note_id", task_ids)
+
+    def tasks_for_notes(self, note_ids: Iterable[int]) -> Dict[int, List[int]]:
+        """Linked task ids per note."""
+        return self._neighbours("note_id", "task_id", note_ids)
+
+    def delete_task(self, task_id: int) -> None:
+        """Drop every link of a deleted task."""
+        with self._lock:
+            self._connection().execute("DELETE FROM task_notes WHERE task_id = ?", (int(task_id),))
+
+    def delete_note(self, note_id: int) -> None:
+        """Drop every link of a deleted note."""
+        with self._lock:
+            self._connection().execute("DELETE FROM task_notes WHERE note_id = ?", (int(note_id),))
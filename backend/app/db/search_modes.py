@@ -0,0 +1,11 @@
+"""Search modes of ChromaManager.search_tasks / search_notes.
+
+    semantic: vector similarity only
+    lexical:  BM25 keyword ranking only (see lexical_index)
+    hybrid:   both rankings fused with reciprocal rank fusion
+"""
+import os
+
+SEARCH_MODES = ("hybrid", "semantic", "lexical")
+# Default mode when a search does not name one
+SEARCH_MODE = os.getenv("SEARCH_MODE", "hybrid")
@@ -1,16 +1,80 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from app.utils import tracing
 import datetime
+import json
 
 agents_bp = Blueprint("agents", __name__)
 
-from agents.agent_interface import create_agent, run_agent
 
-# Create agent when Flask starts
-create_agent()
+def _agents():
+    """Import the agent stack on first use so LangChain/LangGraph stay out of app startup."""
+    from agents import agent_interface
+    return agent_interface
+
+
+def _sse(events, debug_timing: bool = False):
+    """Format (event, data) pairs as Server-Sent Events.
+    
+    With debug_timing a traced stream ends with a `timing` event holding the
+    X-Debug-Timing value (headers are sent before the body is produced).
+    """
+    try:
+        for event, data in events:
+            yield f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+    except Exception as e:
+        span = tracing.current_span()
+        if span is not None:
+            span.error = f"{type(e).__name__}: {e}"
+        yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+    root = tracing.current_span()
+    if debug_timing and root is not None:
+        timing = {tracing.DEBUG_TIMING_HEADER: root.trace.timing_header(root)}
+        yield f"event: timing\ndata: {json.dumps(timing)}\n\n"
+
 
 # Use in a route
 @agents_bp.route('/agent', methods=['POST'])
 def agent_endpoint():
     user_message = request.json.get('message')
-    messages = run_agent(user_message)
-    return jsonify({"messages": messages}), 200
\ No newline at end of file
+    session_id = request.json.get('session_id')
+    if request.args.get('stream') in ('1', 'true'):
+        debug_timing = request.headers.get(tracing.DEBUG_TIMING_HEADER, "0") not in ("", "0")
+        events = _sse(_agents().stream_agent(user_message, session_id), debug_timing)
+        return Response(
+            stream_with_context(tracing.stream_in_span(events)),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+    messages = _agents().run_agent(user_message, session_id)
+    return jsonify({"messages": messages, "session_id": session_id}), 200
+
+
+@agents_bp.route('/agent/async', methods=['POST'])
+def agent_async_endpoint():
+    """Start the agent on the async runtime and return at once; poll the run for the messages.
+    
+    LLM calls of all runs are queued by the scheduler, and no Flask worker waits on a run.
+    """
+    user_message = request.json.get('message')
+    session_id = request.json.get('session_id')
+    run_id = _agents().start_agent_run(user_message, session_id)
+    return (jsonify({"run_id": run_id, "status": "running", "session_id": session_id}), 202,
+            {"Location": f"{request.path}/{run_id}"})
+
+
+@agents_bp.route('/agent/async/<run_id>', methods=['GET'])
+def agent_async_result(run_id):
+    run = _agents().get_agent_run(run_id)
+    if run is None:
+        return jsonify({"error": "Run not found"}), 404
+    if run["status"] == "running":
+        return jsonify(run), 202
+    if run["status"] == "error":
+        return jsonify(run), 500
+    return jsonify({"run_id": run_id, "status": "done", "messages": run["result"],
+                    "session_id": run["session_id"]}), 200
+
+
+@agents_bp.route('/scheduler', methods=['GET'])
+def scheduler_stats():
+    return jsonify(_agents().get_scheduler_stats())
@@ -0,0 +1,16 @@
+from flask import Blueprint, request, jsonify
+from app.db.chroma_manager import get_chroma_manager
+from app.utils.bulk_args import parse_bulk_body
+
+links_bp = Blueprint("links", __name__)
+
+
+@links_bp.route("/bulk", methods=["POST"])
+def link_bulk():
+    try:
+        args = parse_bulk_body(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    manager = get_chroma_manager()
+    results = manager.link_bulk(args["items"], args["batch_size"])
+    return jsonify({"message": "Links processed", "results": results})
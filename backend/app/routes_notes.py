@@ -1,5 +1,8 @@
 from flask import Blueprint, request, jsonify
 from app.db.chroma_manager import get_chroma_manager
+from app.utils.bulk_args import parse_bulk_body
+from app.utils.pagination import parse_list_args
+from app.utils.search_args import parse_search_args
 import datetime
 
 notes_bp = Blueprint("notes", __name__)
@@ -19,11 +22,56 @@ def create_note():
     return jsonify({"message": "Note created", "id": note_id}), 201
 
 
+@notes_bp.route("/bulk", methods=["POST"])
+def create_notes_bulk():
+    try:
+        args = parse_bulk_body(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    created_at = datetime.datetime.now().isoformat()
+    manager = get_chroma_manager()
+    items = [
+        {**item, "created_at": created_at} if isinstance(item, dict) else item
+        for item in args["items"]
+    ]
+    results = manager.create_notes_bulk(items, args["batch_size"])
+    return jsonify({"message": "Notes processed", "results": results}), 201
+
+
+@notes_bp.route("/bulk", methods=["PUT"])
+def update_notes_bulk():
+    try:
+        args = parse_bulk_body(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    manager = get_chroma_manager()
+    results = manager.update_notes_bulk(args["items"], args["batch_size"])
+    return jsonify({"message": "Notes processed", "results": results})
+
+
 @notes_bp.route("/", methods=["GET"])
 def get_notes():
+    try:
+        args = parse_list_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    manager = get_chroma_manager()
+    page = manager.get_notes_page(args["limit"], args["cursor"], args["fields"])
+    # Without a limit keep returning the plain list
+    return jsonify(page if args["limit"] else page["items"])
+
+
+@notes_bp.route("/search", methods=["GET"])
+def search_notes():
+    """Search notes; created_at filters run inside Chroma (see search_args)."""
+    try:
+        args = parse_search_args(request.args, date_filters=["created_after", "created_before"])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     manager = get_chroma_manager()
-    notes = manager.get_all_notes()
-    return jsonify(notes)
+    results = manager.search_notes(args["query"], args["top_k"], args["mode"],
+                                   args["created_after"], args["created_before"])
+    return jsonify(results)
 
 
 @notes_bp.route("/<int:id>", methods=["GET"])
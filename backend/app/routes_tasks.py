@@ -1,5 +1,8 @@
 from flask import Blueprint, request, jsonify
 from app.db.chroma_manager import get_chroma_manager
+from app.utils.bulk_args import parse_bulk_body
+from app.utils.pagination import parse_list_args
+from app.utils.search_args import parse_search_args
 
 tasks_bp = Blueprint("tasks", __name__)
 
@@ -17,11 +20,51 @@ def create_task():
     return jsonify({"message": "Task created", "id": task_id}), 201
 
 
+@tasks_bp.route("/bulk", methods=["POST"])
+def create_tasks_bulk():
+    try:
+        args = parse_bulk_body(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    manager = get_chroma_manager()
+    results = manager.create_tasks_bulk(args["items"], args["batch_size"])
+    return jsonify({"message": "Tasks processed", "results": results}), 201
+
+
+@tasks_bp.route("/bulk", methods=["PUT"])
+def update_tasks_bulk():
+    try:
+        args = parse_bulk_body(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    manager = get_chroma_manager()
+    results = manager.update_tasks_bulk(args["items"], args["batch_size"])
+    return jsonify({"message": "Tasks processed", "results": results})
+
+
 @tasks_bp.route("/", methods=["GET"])
 def get_tasks():
+    try:
+        args = parse_list_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    manager = get_chroma_manager()
+    page = manager.get_tasks_page(args["limit"], args["cursor"], args["fields"], args["hydrate"])
+    # Without a limit keep returning the plain list
+    return jsonify(page if args["limit"] else page["items"])
+
+
+@tasks_bp.route("/search", methods=["GET"])
+def search_tasks():
+    """Search tasks; status and deadline filters run inside Chroma (see search_args)."""
+    try:
+        args = parse_search_args(request.args, filters=["status"], date_filters=["deadline_before", "deadline_after"])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     manager = get_chroma_manager()
-    tasks = manager.get_all_tasks()
-    return jsonify(tasks)
+    results = manager.search_tasks(args["query"], args["top_k"], args["mode"], args["status"],
+                                   args["deadline_before"], args["deadline_after"])
+    return jsonify(results)
 
 
 @tasks_bp.route("/<int:id>", methods=["GET"])
@@ -0,0 +1,25 @@
+"""Request body parsing for the bulk endpoints (POST/PUT /tasks/bulk and /notes/bulk, POST /links/bulk).
+
+Body:
+    items:      list of records, updates ({"id"} plus fields) or links; each one is validated on its own
+    batch_size: records per embed/upsert call (1..MAX_BATCH_SIZE); omit for BULK_BATCH_SIZE
+"""
+from typing import Any, Dict
+
+from app.db.chroma_manager import MAX_BATCH_SIZE, valid_batch_size
+
+
+def parse_bulk_body(data: Any) -> Dict[str, Any]:
+    """Parse a bulk request body. Raises ValueError with a readable message on bad input."""
+    if not isinstance(data, dict):
+        raise ValueError("body must be a JSON object with an items list")
+
+    items = data.get("items", [])
+    if not isinstance(items, list):
+        raise ValueError("items must be a list")
+
+    batch_size = data.get("batch_size")
+    if batch_size is not None and not valid_batch_size(batch_size):
+        raise ValueError(f"batch_size must be an integer between 1 and {MAX_BATCH_SIZE}")
+
+    return {"items": items, "batch_size": batch_size}
@@ -5,7 +5,7 @@ All operations work directly with ChromaDB - simple and straightforward.
 
 Keep these functions simple and idempotent so agents can call them safely.
 """
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Union
 from app.db.chroma_manager import get_chroma_manager
 
 
@@ -110,34 +110,46 @@ def remove_note_from_task(task_id: int, note_id: int) -> None:
 
 
 # --- Vector search / retrieval helpers ---
-def search_notes(query: str, top_k: int = 5) -> List[Dict[str, Any]]:
-    """Search for notes using semantic similarity (finds notes by meaning, not exact keywords).
-    Use this to find notes related to a topic, concept, or question.
+def search_notes(query: str, top_k: int = 5, mode: Optional[str] = None,
+                 created_after: Optional[str] = None, created_before: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Search for notes by meaning and by keywords.
+    Use this to find notes related to a topic, concept, or question, or that mention an exact term.
     
     Args:
-        query: A natural language search query (e.g., "Python programming tips")
+        query: A natural language search query (e.g., "Python programming tips") or exact words/codes
         top_k: Maximum number of results to return (default: 5)
+        mode: 'hybrid' (meaning + keywords, default), 'semantic' (meaning only) or 'lexical' (exact keywords only, e.g. course codes or commands)
+        created_after: Only notes created on or after this date, YYYY-MM-DD (optional)
+        created_before: Only notes created on or before this date, YYYY-MM-DD (optional)
     
     Returns:
         List of matching notes with their content and metadata
     """
     manager = get_chroma_manager()
-    return manager.search_notes(query, top_k=top_k)
+    return manager.search_notes(query, top_k=top_k, mode=mode,
+                                created_after=created_after, created_before=created_before)
 
 
-def search_tasks(query: str, top_k: int = 5) -> List[Dict[str, Any]]:
-    """Search for tasks using semantic similarity (finds tasks by meaning, not exact keywords).
-    Use this to find tasks related to a topic, project, or question.
+def search_tasks(query: str, top_k: int = 5, mode: Optional[str] = None, status: Optional[str] = None,
+                 deadline_before: Optional[str] = None, deadline_after: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Search for tasks by meaning and by keywords.
+    Use this to find tasks related to a topic, project, or question, or that mention an exact term.
     
     Args:
-        query: A natural language search query (e.g., "shopping tasks")
+        query: A natural language search query (e.g., "shopping tasks") or exact words/codes
         top_k: Maximum number of results to return (default: 5)
+        mode: 'hybrid' (meaning + keywords, default), 'semantic' (meaning only) or 'lexical' (exact keywords only, e.g. course codes or ticket numbers)
+        status: Only tasks with this status - 'pending', 'in_progress' or 'completed' (optional)
+        deadline_before: Only tasks due on or before this date, YYYY-MM-DD (optional)
+        deadline_after: Only tasks due on or after this date, YYYY-MM-DD (optional)
     
     Returns:
-        List of matching tasks with their details and metadata
+        List of matching tasks with their details and metadata.
+        Use an empty query with filters to list tasks, e.g. pending tasks due this week.
     """
     manager = get_chroma_manager()
-    return manager.search_tasks(query, top_k=top_k)
+    return manager.search_tasks(query, top_k=top_k, mode=mode, status=status,
+                                deadline_before=deadline_before, deadline_after=deadline_after)
 
 
 def get_note_chroma(note_id: int) -> Optional[Dict[str, Any]]:
@@ -167,25 +179,25 @@ def get_task_chroma(task_id: int) -> Optional[Dict[str, Any]]:
 
 
 # Small RAG helper: Retrieval-Augmented Generation.
-def rag_context_for_query(query: str, top_k: int = 5) -> Dict[str, Any]:
+def rag_context_for_query(query: Union[str, List[str]], top_k: int = 5) -> Dict[str, Any]:
     """Get relevant context (both notes and tasks) for answering a question or providing insights.
     Use this when you need to gather information before responding to a complex query.
     
     Args:
-        query: A natural language question or topic (e.g., "What are my urgent tasks?")
-        top_k: Maximum number of items to retrieve per type (default: 5)
+        query: A natural language question or topic (e.g., "What are my urgent tasks?"), or a list of them
+        top_k: Maximum number of items to retrieve per type and query (default: 5)
     
     Returns:
-        Dictionary with combined context from notes and tasks relevant to the query
+        Dictionary with combined context from notes and tasks relevant to the query, most relevant first
     """
-    notes = search_notes(query, top_k=top_k)
-    tasks = search_tasks(query, top_k=top_k)
+    queries = [query] if isinstance(query, str) else list(query)
+    manager = get_chroma_manager()
+    hits = manager.search_context(queries, top_k=top_k)
 
     # flatten texts
     context_items = []
-    for n in notes:
-        context_items.append({"source": "note", "id": n.get("id"), "text": n.get("document"), "meta": n.get("metadata")})
-    for t in tasks:
-        context_items.append({"source": "task", "id": t.get("id"), "text": t.get("document"), "meta": t.get("metadata")})
+    for h in hits:
+        context_items.append({"source": h["source"], "id": h["id"], "text": h["document"], "meta": h["metadata"],
+                              "distance": h["distance"]})
 
     return {"query": query, "items": context_items}
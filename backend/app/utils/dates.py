@@ -0,0 +1,32 @@
+"""Date parsing shared by storage and request parsing.
+
+Chroma cannot compare date strings, so dates are also stored as epoch
+seconds (deadline_ts, created_at_ts) and filtered as numeric ranges.
+"""
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+
+def to_epoch(value: Any, end_of_day: bool = False) -> Optional[int]:
+    """Epoch seconds for a date/datetime string or number, or None if it cannot be parsed.
+
+    Dates without a time zone are taken as UTC. With end_of_day a plain date
+    (YYYY-MM-DD) maps to its last second, for inclusive upper bounds.
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    text = str(value).strip()
+    if text.lstrip("-").isdigit():
+        return int(text)
+    try:
+        parsed = datetime.fromisoformat(text.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    seconds = int(parsed.timestamp())
+    if end_of_day and len(text) == 10:
+        seconds += 24 * 60 * 60 - 1
+    return seconds
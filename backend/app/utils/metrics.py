@@ -0,0 +1,164 @@
+"""In-process metrics in the Prometheus text format (served at GET /metrics).
+
+A small counter/histogram implementation instead of a client library: an
+observation is one dict lookup, a bisect and two additions under a lock, so
+it can stay on in production. Histograms keep one count per bucket and
+build the cumulative `_bucket` series only when /metrics is scraped.
+
+Set METRICS=0 to turn recording off. The endpoint then reports empty series.
+
+The registry lives in the memory of one process: /metrics reports only the
+requests of the worker that answers the scrape. Serve the API from a single
+(multi-threaded) worker, or scrape each worker as a separate target.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, List, Sequence, Tuple
+
+METRICS_ENABLED = os.getenv("METRICS", "1") == "1"
+
+# Latency buckets in seconds, from sub-millisecond lookups to slow LLM calls
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+COUNT_BUCKETS = (1, 2, 3, 4, 5, 6, 8, 10, 15, 20)
+
+_registry: List["_Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names: Sequence[str], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing value per label set."""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_label_text(self.labelnames, key)} {value}" for key, value in items]
+
+
+class Histogram(_Metric):
+    """Bucketed observations (with sum and count) per label set."""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], list] = {}  # key -> [bucket counts (+Inf last), sum]
+
+    def observe(self, value: float, **labels) -> None:
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the enclosed block, in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(counts), total) for key, (counts, total) in self._series.items()]
+        lines = []
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(list(self.buckets) + ["+Inf"], counts):
+                cumulative += count
+                labels = _label_text(self.labelnames, key, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_text(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_label_text(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+def render() -> str:
+    """All registered metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ===== Metrics recorded across the app =====
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Flask request latency by blueprint route.",
+    ["method", "route", "status"])
+CHROMA_OPERATION_SECONDS = Histogram(
+    "chroma_operation_duration_seconds", "Latency of ChromaDB collection calls.",
+    ["collection", "operation"])
+CHROMA_OPERATION_ERRORS = Counter(
+    "chroma_operation_errors_total", "ChromaDB collection calls that raised.",
+    ["collection", "operation"])
+EMBEDDING_BATCH_SECONDS = Histogram(
+    "embedding_batch_duration_seconds", "Time to embed one batch on the embedding workers.")
+EMBEDDING_TEXTS = Counter(
+    "embedding_texts_total", "Texts embedded by the model (embedding cache misses).")
+AGENT_LLM_SECONDS = Histogram(
+    "agent_llm_call_duration_seconds", "Agent LLM call latency (cached responses excluded).",
+    ["model"])
+AGENT_LLM_CACHE_HITS = Counter(
+    "agent_llm_cache_hits_total", "Agent LLM calls answered from the response cache.")
+AGENT_TOOL_SECONDS = Histogram(
+    "agent_tool_call_duration_seconds", "Agent tool call latency.",
+    ["tool", "outcome"])
+AGENT_LOOP_ITERATIONS = Histogram(
+    "agent_loop_iterations", "LLM calls per agent request.",
+    buckets=COUNT_BUCKETS)
+AGENT_TOKENS = Counter(
+    "agent_tokens_total", "Tokens reported by the LLM backend.",
+    ["model", "kind"])
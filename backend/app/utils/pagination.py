@@ -0,0 +1,32 @@
+"""Query-string parsing for the paginated list endpoints (GET /tasks/, GET /notes/).
+
+Supported arguments:
+    limit:   page size (1..MAX_PAGE_SIZE); omit to get the full list as before
+    cursor:  next_cursor from the previous page (the last id it returned)
+    fields:  comma separated keys to return, e.g. "id,title,status"
+    hydrate: "0"/"false" to return related items as ids only
+"""
+from typing import Any, Dict, Mapping
+
+MAX_PAGE_SIZE = 1000
+
+
+def parse_list_args(args: Mapping[str, str]) -> Dict[str, Any]:
+    """Parse list arguments. Raises ValueError with a readable message on bad input."""
+    limit = args.get("limit")
+    if limit is not None:
+        if not limit.isdigit() or not 1 <= int(limit) <= MAX_PAGE_SIZE:
+            raise ValueError(f"limit must be an integer between 1 and {MAX_PAGE_SIZE}")
+        limit = int(limit)
+    
+    cursor = args.get("cursor") or None
+    if cursor is not None and not cursor.isdigit():
+        raise ValueError("invalid cursor")
+    
+    fields = args.get("fields")
+    if fields is not None:
+        fields = [f.strip() for f in fields.split(",") if f.strip()]
+    
+    hydrate = args.get("hydrate", "1").lower() not in ("0", "false", "no")
+    
+    return {"limit": limit, "cursor": cursor, "fields": fields, "hydrate": hydrate}
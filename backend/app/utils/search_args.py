@@ -0,0 +1,44 @@
+"""Query-string parsing for the search endpoints (GET /tasks/search, GET /notes/search).
+
+Supported arguments:
+    q:      search text; omit to list the records that match the filters
+    mode:   "hybrid", "semantic" or "lexical" (default: SEARCH_MODE)
+    top_k:  number of results (1..MAX_TOP_K, default 5)
+    plus the filters of each endpoint, e.g. status or deadline_before.
+    Dates are YYYY-MM-DD, ISO datetimes or epoch seconds; bounds are inclusive.
+
+Dates are stored next to their text form as epoch seconds (deadline_ts,
+created_at_ts; see app.utils.dates) so the filters run as range conditions
+inside Chroma.
+"""
+from typing import Any, Dict, Iterable, Mapping
+
+from app.db.search_modes import SEARCH_MODES
+from app.utils.dates import to_epoch
+
+MAX_TOP_K = 100
+
+
+def parse_search_args(args: Mapping[str, str], filters: Iterable[str] = (),
+                      date_filters: Iterable[str] = ()) -> Dict[str, Any]:
+    """Parse search arguments. Raises ValueError with a readable message on bad input.
+
+    `filters` are passed through as strings; `date_filters` must be parseable by to_epoch.
+    """
+    mode = args.get("mode") or None
+    if mode is not None and mode not in SEARCH_MODES:
+        raise ValueError(f"mode must be one of {', '.join(SEARCH_MODES)}")
+
+    top_k = args.get("top_k", "5")
+    if not top_k.isdigit() or not 1 <= int(top_k) <= MAX_TOP_K:
+        raise ValueError(f"top_k must be an integer between 1 and {MAX_TOP_K}")
+
+    parsed = {"query": args.get("q", ""), "mode": mode, "top_k": int(top_k)}
+    for name in filters:
+        parsed[name] = args.get(name) or None
+    for name in date_filters:
+        value = args.get(name) or None
+        if value is not None and to_epoch(value) is None:
+            raise ValueError(f"{name} must be a date (YYYY-MM-DD), an ISO datetime or epoch seconds")
+        parsed[name] = value
+    return parsed
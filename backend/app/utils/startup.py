@@ -0,0 +1,52 @@
+"""Startup phase timings.
+
+Heavy dependencies (chromadb, the embedding model, the agent stack) are only
+loaded when something needs them. Each phase is timed whenever it runs: at
+startup with STARTUP_PROFILE=1 or STARTUP_WARMUP=1, otherwise on the first
+request that needs it.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+# Run every phase inside create_app() and print the timings
+STARTUP_PROFILE = os.getenv("STARTUP_PROFILE", "0") == "1"
+# Run every phase in a background thread after create_app() returns
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "0") == "1"
+
+_timings: Dict[str, float] = {}
+_lock = threading.Lock()
+
+
+def record(name: str, seconds: float) -> None:
+    """Add time spent in a phase."""
+    with _lock:
+        _timings[name] = _timings.get(name, 0.0) + seconds
+
+
+@contextmanager
+def phase(name: str):
+    """Time the enclosed block as a startup phase."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def timings() -> Dict[str, float]:
+    """Milliseconds per phase, in the order the phases first ran."""
+    with _lock:
+        return {name: round(seconds * 1000, 1) for name, seconds in _timings.items()}
+
+
+def report() -> str:
+    """Phase timings as a printable table."""
+    rows = timings()
+    width = max([len(name) for name in rows] + [5])
+    lines = [f"{'phase'.ljust(width)}  ms"]
+    lines += [f"{name.ljust(width)}  {ms:.1f}" for name, ms in rows.items()]
+    lines.append(f"{'total'.ljust(width)}  {sum(rows.values()):.1f}")
+    return "\n".join(lines)
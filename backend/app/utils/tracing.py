@@ -0,0 +1,228 @@
+"""Per-request tracing spans: route -> agent LLM/tool loop -> tools -> Chroma calls.
+
+Spans follow the OpenTelemetry data model (trace and span ids, parent ids,
+kind, attributes, status) and are exported as OTLP/JSON, one request per
+line, so the file can be read directly or loaded by an OpenTelemetry
+Collector (otlpjsonfile receiver). The trace id is the request id and is
+returned in X-Request-Id; an incoming W3C `traceparent` header is continued.
+
+A request is traced when TRACE_FILE is set (every request is exported
+there) or when it sends `X-Debug-Timing: 1`. The response then carries an
+X-Debug-Timing header with the total time and count per span name, e.g.
+`total;dur=812.4, agent.call_llm;dur=640.2;count=2, chroma.tasks.get;dur=3.1;count=14`.
+Streamed responses send their headers before the body is produced, so their
+trace ends when the body is closed and the timing comes as a last `timing`
+event instead. Untraced requests pay one context-variable lookup per span.
+
+The current span lives in a context variable, so it follows asyncio tasks
+and work submitted with contextvars.copy_context().run; spans created
+outside a traced request are not recorded.
+"""
+import contextvars
+import json
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+TRACE_FILE = os.getenv("TRACE_FILE", "")
+SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "tasks-notes-api")
+DEBUG_TIMING_HEADER = "X-Debug-Timing"
+
+# OTLP span kinds
+INTERNAL, SERVER, CLIENT = 1, 2, 3
+STATUS_ERROR = 2
+
+_current: contextvars.ContextVar = contextvars.ContextVar("trace_span", default=None)
+_export_lock = threading.Lock()
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": value}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items() if value is not None]
+
+
+class Span:
+    """One timed operation within a trace."""
+
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str], kind: int, attributes: Dict[str, Any]):
+        self.trace = trace
+        self.name = name
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes = attributes
+        self.error: Optional[str] = None
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def end(self) -> None:
+        self.end_ns = time.time_ns()
+        self.trace.add(self)
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span = {
+            "traceId": self.trace.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": _otlp_attributes(self.attributes),
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        if self.error is not None:
+            span["status"] = {"code": STATUS_ERROR, "message": self.error}
+        return span
+
+
+class Trace:
+    """The finished spans of one request, collected from any thread."""
+
+    def __init__(self, trace_id: Optional[str] = None):
+        self.trace_id = trace_id or secrets.token_hex(16)
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+        self._token = None
+
+    def add(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """The trace as an OTLP/JSON ExportTraceServiceRequest."""
+        with self._lock:
+            spans = [span.to_otlp() for span in self.spans]
+        return {"resourceSpans": [{
+            "resource": {"attributes": _otlp_attributes({"service.name": SERVICE_NAME})},
+            "scopeSpans": [{"scope": {"name": __name__}, "spans": spans}],
+        }]}
+
+    def timing_header(self, root: Span) -> str:
+        """Total milliseconds and count per span name, in Server-Timing syntax."""
+        totals: Dict[str, List[float]] = {}
+        with self._lock:
+            spans = [span for span in self.spans if span is not root]
+        for span in spans:
+            total = totals.setdefault(span.name, [0.0, 0])
+            total[0] += span.duration_ms
+            total[1] += 1
+        entries = [f"total;dur={root.duration_ms:.1f}"]
+        entries += [f"{name};dur={ms:.1f};count={count}" for name, (ms, count) in totals.items()]
+        return ", ".join(entries)
+
+
+def _parse_traceparent(header: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """(trace id, parent span id) from a W3C traceparent header, or (None, None)."""
+    parts = (header or "").strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None, None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None, None
+    if set(parts[1]) == {"0"} or set(parts[2]) == {"0"}:
+        return None, None
+    return parts[1], parts[2]
+
+
+def start_trace(name: str, traceparent: Optional[str] = None, **attributes) -> Span:
+    """Start a trace with a root span and make it current. Close it with end_trace()."""
+    trace_id, parent_id = _parse_traceparent(traceparent)
+    trace = Trace(trace_id)
+    root = Span(trace, name, parent_id, SERVER, attributes)
+    trace._token = _current.set(root)
+    return root
+
+
+def detach(root: Span) -> None:
+    """Restore the context from before start_trace() without ending the trace."""
+    if root.trace._token is not None:
+        _current.reset(root.trace._token)
+        root.trace._token = None
+
+
+def end_trace(root: Span) -> None:
+    """End the root span, restore the previous context and export the trace if TRACE_FILE is set."""
+    detach(root)
+    root.end()
+    if TRACE_FILE:
+        export(root.trace, TRACE_FILE)
+
+
+def export(trace: Trace, path: str) -> None:
+    """Append a trace to a JSON-lines file."""
+    line = json.dumps(trace.to_otlp(), default=str) + "\n"
+    try:
+        with _export_lock:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(line)
+    except OSError as e:
+        print(f"Error exporting trace: {e}")
+
+
+def stream_in_span(iterable: Iterable[Any]) -> Iterator[Any]:
+    """Iterate over a streamed response body with the current span active.
+
+    The body of a streamed response is produced after the view returns and
+    the trace has been detached (see create_app), so each item is pulled with
+    the span set again.
+    """
+    # Read now: the generator body only starts once the response is being sent
+    parent = _current.get()
+
+    def generate():
+        iterator = iter(iterable)
+        while True:
+            token = _current.set(parent)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                _current.reset(token)
+            yield item
+    return generate()
+
+
+def current_span() -> Optional[Span]:
+    """The active span, or None outside a traced request."""
+    return _current.get()
+
+
+@contextmanager
+def span(name: str, kind: int = INTERNAL, **attributes):
+    """Record the enclosed block as a child of the current span. Yields the span (None when not tracing)."""
+    parent = _current.get()
+    if parent is None:
+        yield None
+        return
+    child = Span(parent.trace, name, parent.span_id, kind, attributes)
+    token = _current.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current.reset(token)
+        child.end()
@@ -0,0 +1,105 @@
+"""Chroma calls per task read, for several task x link counts.
+
+Task reads hydrate their notes with one notes_col.get for the whole page,
+so the number of Chroma calls must not depend on how many links exist.
+This script fills a throwaway persist directory, wraps both collections in
+a counting proxy and prints the calls made by get_all_tasks() and
+get_task() with a cold record cache. Vectors do not change the call count,
+so records are embedded with a cheap hash function instead of the model.
+
+Run from backend/:
+    python -m bench.hydration_calls
+    python -m bench.hydration_calls --tasks 10 50 200 --links 0 1 5 20
+"""
+import argparse
+import hashlib
+import shutil
+import tempfile
+from collections import Counter
+
+from chromadb.api.types import EmbeddingFunction
+
+from app.db import chroma_manager
+from app.db.chroma_manager import ChromaManager, TimedCollection
+
+
+class HashEmbeddingFunction(EmbeddingFunction):
+    """Deterministic 16-dimensional vectors derived from the text hash."""
+
+    def __init__(self):
+        pass
+
+    def __call__(self, input):
+        return [[b / 255 for b in hashlib.sha256(text.encode("utf-8")).digest()[:16]] for text in input]
+
+    @staticmethod
+    def name() -> str:
+        return "bench-hash"
+
+
+class CountingCollection:
+    """Collection proxy that counts the Chroma calls made through it."""
+
+    def __init__(self, collection):
+        self._collection = collection
+        self.name = collection.name
+        self.calls = Counter()
+
+    def __getattr__(self, attr: str):
+        value = getattr(self._collection, attr)
+        if attr not in TimedCollection.OPERATIONS:
+            return value
+
+        def counted(*args, **kwargs):
+            self.calls[attr] += 1
+            return value(*args, **kwargs)
+        return counted
+
+
+def measure(tasks: int, links: int) -> dict:
+    """Chroma calls of the task reads for `tasks` tasks with `links` notes each."""
+    persist_dir = tempfile.mkdtemp(prefix="bench-hydration-")
+    chroma_manager.PERSIST_DIR = persist_dir
+    chroma_manager.default_embedding_function = HashEmbeddingFunction
+    chroma_manager.default_model = HashEmbeddingFunction
+    try:
+        manager = ChromaManager()
+        task_ids = [r["id"] for r in manager.create_tasks_bulk([{"title": f"Task {i}"} for i in range(tasks)])]
+        note_ids = [r["id"] for r in manager.create_notes_bulk([{"title": f"Note {i}"} for i in range(links)])]
+        manager.link_bulk([{"task_id": t, "note_id": n} for t in task_ids for n in note_ids])
+
+        manager.tasks_col = CountingCollection(manager.tasks_col)
+        manager.notes_col = CountingCollection(manager.notes_col)
+        row = {}
+        for name, read in (("get_all_tasks", manager.get_all_tasks),
+                           ("get_task", lambda: manager.get_task(task_ids[0]))):
+            manager.cache.clear()
+            manager.tasks_col.calls.clear()
+            manager.notes_col.calls.clear()
+            read()
+            row[name] = sum(manager.tasks_col.calls.values()) + sum(manager.notes_col.calls.values())
+        return row
+    finally:
+        shutil.rmtree(persist_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--links", type=int, nargs="+", default=[0, 1, 5, 20])
+    args = parser.parse_args()
+
+    print(f"{'tasks':>6} {'links/task':>10} {'get_all_tasks':>14} {'get_task':>9}")
+    linked = set()
+    for tasks in args.tasks:
+        for links in args.links:
+            row = measure(tasks, links)
+            print(f"{tasks:>6} {links:>10} {row['get_all_tasks']:>14} {row['get_task']:>9}")
+            # Without links there are no notes to fetch, so that row is one call lower
+            if links:
+                linked.add((row["get_all_tasks"], row["get_task"]))
+    print("Call count is", "constant" if len(linked) <= 1 else "NOT constant", "across task/link counts")
+
+
+if __name__ == "__main__":
+    main()
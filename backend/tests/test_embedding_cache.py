@@ -0,0 +1,18 @@
+"""EmbeddingCache keys and the model id they are scoped to."""
+from app.db.embedding_cache import EmbeddingCache
+from app.db.embeddings import default_embedding_function, default_model, embedding_model_id
+
+
+def test_model_id_names_the_concrete_model():
+    assert embedding_model_id(default_model()) == "onnx_mini_lm_l6_v2:all-MiniLM-L6-v2"
+    assert embedding_model_id(default_embedding_function()) == "default"
+
+
+def test_vectors_of_another_model_are_not_reused(tmp_path):
+    EmbeddingCache(str(tmp_path), "onnx_mini_lm_l6_v2:all-MiniLM-L6-v2").put_many(["hello"], [[0.5, 0.25]])
+
+    same = EmbeddingCache(str(tmp_path), "onnx_mini_lm_l6_v2:all-MiniLM-L6-v2")
+    assert same.get_many(["hello"]) == {"hello": [0.5, 0.25]}
+    other = EmbeddingCache(str(tmp_path), "onnx_mini_lm_l6_v2:all-mpnet-base-v2")
+    assert other.get_many(["hello"]) == {}
+    assert other.stats()["misses"] == 1
@@ -0,0 +1,31 @@
+"""IdSequence counters and the migrations recorded next to them."""
+import os
+import sqlite3
+
+from app.db.id_sequence import SEQUENCE_FILE, IdSequence
+
+
+def test_migrations_are_kept_apart_from_sequences(tmp_path):
+    sequences = IdSequence(str(tmp_path))
+    sequences.ensure("tasks", 0)
+    assert not sequences.is_done("id_metadata")
+    sequences.mark_done("id_metadata")
+
+    reopened = IdSequence(str(tmp_path))
+    assert reopened.is_done("id_metadata")
+    assert reopened.get("id_metadata") is None
+    assert reopened.next("tasks") == 1
+
+
+def test_placeholder_rows_of_old_files_become_migrations(tmp_path):
+    conn = sqlite3.connect(os.path.join(tmp_path, SEQUENCE_FILE))
+    conn.execute("CREATE TABLE sequences (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+    conn.executemany("INSERT INTO sequences VALUES (?, ?)", [("tasks", 7), ("epoch_metadata", 1), ("relations", 1)])
+    conn.commit()
+    conn.close()
+
+    sequences = IdSequence(str(tmp_path))
+    assert sequences.is_done("epoch_metadata") and sequences.is_done("relations")
+    assert not sequences.is_done("id_metadata")
+    assert sequences.get("relations") is None
+    assert sequences.get("tasks") == 7
@@ -0,0 +1,47 @@
+"""LexicalIndex builds and background rebuilds."""
+import threading
+import time
+
+from app.db.lexical_index import LexicalIndex
+
+
+def test_first_build_keeps_writes_made_while_loading():
+    index = LexicalIndex(max_age=0)
+
+    def load():
+        # A write lands after the snapshot was read
+        index.add("2", "written during the build")
+        return {"1": "alpha ticket CS-101"}
+
+    index.ensure_built(load)
+    assert [record_id for record_id, _ in index.search("cs 101", 5)] == ["1"]
+    assert [record_id for record_id, _ in index.search("written", 5)] == ["2"]
+
+
+def test_stale_index_is_rebuilt_in_the_background():
+    index = LexicalIndex(max_age=0.01)
+    index.ensure_built(lambda: {"1": "old document"})
+    time.sleep(0.02)
+
+    loading = threading.Event()
+    release = threading.Event()
+
+    def slow_load():
+        loading.set()
+        release.wait(5)
+        return {"1": "old document", "3": "from another worker"}
+
+    index.ensure_built(slow_load)
+    assert loading.wait(5)
+    # Searches and writes do not wait for the rebuild
+    assert [record_id for record_id, _ in index.search("old", 5)] == ["1"]
+    index.add("4", "created during the rebuild")
+    index.remove("1")
+    release.set()
+
+    deadline = time.monotonic() + 5
+    while not index.search("another", 5) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert [record_id for record_id, _ in index.search("another", 5)] == ["3"]
+    assert [record_id for record_id, _ in index.search("rebuild", 5)] == ["4"]
+    assert index.search("old", 5) == []
@@ -0,0 +1,103 @@
+"""LLMScheduler and async agent runs, driven offline by ScriptedChatModel."""
+import asyncio
+import time
+
+from langchain_core.messages import HumanMessage
+
+from agents.llm_backends import ScriptedChatModel
+from agents.scheduler import AsyncRuntime, LLMScheduler, RunRegistry
+
+LATENCY = 0.05
+
+
+async def _watch(scheduler: LLMScheduler, peaks: dict, stop: asyncio.Event) -> None:
+    """Record the highest in_flight and queue_depth seen until stop is set."""
+    while not stop.is_set():
+        stats = scheduler.stats()
+        peaks["in_flight"] = max(peaks["in_flight"], stats["in_flight"])
+        peaks["queue_depth"] = max(peaks["queue_depth"], stats["queue_depth"])
+        await asyncio.sleep(LATENCY / 10)
+
+
+async def _run_with_watch(scheduler: LLMScheduler, coros) -> tuple:
+    peaks = {"in_flight": 0, "queue_depth": 0}
+    stop = asyncio.Event()
+    watcher = asyncio.create_task(_watch(scheduler, peaks, stop))
+    results = await asyncio.gather(*coros)
+    stop.set()
+    await watcher
+    return results, peaks
+
+
+def test_scheduler_caps_concurrent_llm_calls():
+    llm = ScriptedChatModel(script=[{"content": "ok"}], latency=LATENCY)
+    scheduler = LLMScheduler(max_concurrent=2)
+
+    async def call(i):
+        async with scheduler.slot():
+            return await llm.ainvoke([HumanMessage(content=f"question {i}")])
+
+    async def main():
+        return await _run_with_watch(scheduler, [call(i) for i in range(6)])
+
+    start = time.perf_counter()
+    results, peaks = asyncio.run(main())
+    elapsed = time.perf_counter() - start
+
+    assert [r.content for r in results] == ["ok"] * 6
+    assert peaks == {"in_flight": 2, "queue_depth": 4}
+    # Three waves of two calls
+    assert elapsed >= 3 * LATENCY
+    assert scheduler.stats() == {"max_concurrent": 2, "in_flight": 0, "queue_depth": 0, "completed": 6}
+
+
+def test_scheduler_hands_slots_out_in_fifo_order():
+    scheduler = LLMScheduler(max_concurrent=1)
+    order = []
+
+    async def call(i):
+        async with scheduler.slot():
+            order.append(i)
+            await asyncio.sleep(LATENCY / 5)
+
+    async def main():
+        await asyncio.gather(*[call(i) for i in range(5)])
+
+    asyncio.run(main())
+    assert order == [0, 1, 2, 3, 4]
+
+
+def test_arun_goes_through_the_scheduler(tmp_path, monkeypatch):
+    # Tool schemas and sessions are stored under PERSIST_DIR (relative to the cwd)
+    monkeypatch.chdir(tmp_path)
+    from agents.agent_interface import SimpleAgent
+
+    agent = SimpleAgent(backend="stub")
+    agent.llm = ScriptedChatModel(script=[{"content": "answer"}], latency=LATENCY)
+    agent.scheduler = LLMScheduler(max_concurrent=2)
+    agent.response_cache = None
+
+    async def main():
+        return await _run_with_watch(agent.scheduler, [agent.arun(f"question {i}") for i in range(5)])
+
+    results, peaks = asyncio.run(main())
+
+    assert all(messages[-1] == {"type": "ai", "content": "answer", "tool_calls": []} for messages in results)
+    assert peaks == {"in_flight": 2, "queue_depth": 3}
+    assert agent.scheduler.stats()["completed"] == 5
+
+
+def test_run_registry_reports_running_then_done():
+    runtime = AsyncRuntime()
+    runs = RunRegistry()
+
+    async def slow():
+        await asyncio.sleep(LATENCY)
+        return ["done"]
+
+    future = runtime.submit(slow())
+    run_id = runs.add(future, session_id="s1")
+    assert runs.status(run_id) == {"run_id": run_id, "session_id": "s1", "status": "running"}
+    future.result(timeout=5)
+    assert runs.status(run_id) == {"run_id": run_id, "session_id": "s1", "status": "done", "result": ["done"]}
+    assert runs.status("missing") is None
@@ -0,0 +1,74 @@
+"""Prompt budgeting of agent messages and the session store."""
+import time
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+from agents.sessions import SessionStore, budget_messages, estimate_tokens
+
+
+def _tool_loop(question: str, iterations: int, result_chars: int = 3000):
+    messages = [HumanMessage(content=question)]
+    for i in range(iterations):
+        messages.append(AIMessage(content="", tool_calls=[
+            {"name": "search_tasks", "args": {"query": f"q{i}"}, "id": f"call_{i}_0", "type": "tool_call"}]))
+        messages.append(ToolMessage(content=f"result {i} " + "x" * result_chars, tool_call_id=f"call_{i}_0",
+                                    name="search_tasks"))
+    return messages
+
+
+def test_long_tool_loop_stays_within_budget():
+    messages = _tool_loop("What is due this week?", 20)
+    budgeted = budget_messages(messages, budget=6000)
+
+    assert sum(estimate_tokens(m) for m in budgeted[1:]) <= 6000
+    assert isinstance(budgeted[0], SystemMessage) and "tool step(s)" in budgeted[0].content
+    assert budgeted[1] == messages[0]
+    assert budgeted[-2:] == messages[-2:]
+    # Every tool result still follows the AIMessage that called it
+    for i, message in enumerate(budgeted):
+        if isinstance(message, ToolMessage):
+            call = budgeted[i - 1]
+            assert isinstance(call, AIMessage) and call.tool_calls[0]["id"] == message.tool_call_id
+
+
+def test_latest_step_is_kept_even_over_budget():
+    messages = _tool_loop("question", 3)
+    budgeted = budget_messages(messages, budget=10)
+    assert budgeted[1:] == [messages[0]] + messages[-2:]
+
+
+def test_older_turns_are_summarized_after_tool_steps_fit():
+    history = [HumanMessage(content="first question"), AIMessage(content="x" * 8000),
+               HumanMessage(content="second question"), AIMessage(content="short answer")]
+    messages = history + _tool_loop("third question", 2, result_chars=100)
+    budgeted = budget_messages(messages, budget=500)
+
+    assert "first question" in budgeted[0].content
+    assert "tool step(s)" not in budgeted[0].content
+    assert budgeted[1:] == history[2:] + messages[4:]
+
+
+def test_sessions_are_shared_between_stores(tmp_path):
+    SessionStore(str(tmp_path)).append("s1", "first question", "first answer")
+    # Another agent instance or worker process opens its own store
+    other = SessionStore(str(tmp_path), max_turns=2)
+    other.append("s1", "second question", "second answer")
+    other.append("s1", "third question", "third answer")
+
+    history = SessionStore(str(tmp_path)).load("s1")
+    assert [m.content for m in history] == ["second question", "second answer", "third question", "third answer"]
+    other.clear("s1")
+    assert other.load("s1") == []
+
+
+def test_idle_and_least_recent_sessions_are_dropped(tmp_path):
+    store = SessionStore(str(tmp_path), ttl=0.05)
+    store.append("old", "q", "a")
+    time.sleep(0.06)
+    assert store.load("old") == []
+
+    store = SessionStore(str(tmp_path), max_sessions=2)
+    for session_id in ("a", "b", "c"):
+        store.append(session_id, "q", "a")
+    assert store.load("a") == []
+    assert len(store.load("b")) == len(store.load("c")) == 2